@@ -0,0 +1,64 @@
+import time
+import argparse
+import threading
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from page_archive import ArchiveReader
+
+# Headers of a recorded response that no longer describe the body once it is served again
+SKIPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+# Function to get the part of a URL a local server sees: its path and query
+def request_target(url):
+    parts = urlsplit(url)
+    return parts.path + ('?' + parts.query if parts.query else '')
+
+# Function to build a local stand-in for the recipe site that serves the pages of a recorded archive
+# (scrape_recipe.py --record) by path, optionally delaying every response to mimic network latency
+def make_server(archive_path, host='127.0.0.1', port=8000, delay=0.0):
+    archive = ArchiveReader(archive_path)
+    urls = {request_target(url): url for url in archive.index}
+    lock = threading.Lock()  # The reader shares one file handle
+
+    class ArchiveHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if delay:
+                time.sleep(delay)
+            url = urls.get(self.path)
+            with lock:
+                record = archive.get(url) if url else None
+            if record is None:
+                self.send_error(404, 'Page not in archive')
+                return
+            self.send_response(record['status'])
+            for name, value in record['headers'].items():
+                if name.lower() not in SKIPPED_HEADERS:
+                    self.send_header(name, value)
+            self.send_header('Content-Length', str(len(record['body'])))
+            self.end_headers()
+            self.wfile.write(record['body'])
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), ArchiveHandler)
+
+# Main function to serve an archive until interrupted
+def main():
+    parser = argparse.ArgumentParser(description='Serve a recorded page archive as a local stand-in for the recipe site.')
+    parser.add_argument('archive', help='Archive written by scrape_recipe.py --record')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before every response')
+    args = parser.parse_args()
+
+    server = make_server(args.archive, args.host, args.port, args.delay)
+    print(f"Serving {args.archive} on http://{args.host}:{args.port}; crawl it with scrape_recipe.py --base-url http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import asyncio
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+# Default limits for the concurrent fetch engine
+MAX_CONCURRENCY = 16
+PER_HOST_CONCURRENCY = 4
+
+# Pages in flight or waiting for their turn; a slow page stalls the crawl only once this many later pages
+# are done, at the cost of holding up to this many pages in memory
+WINDOW_PAGES = 256
+
+# Function to fetch URLs concurrently through a sliding window, yielding (url, html) pairs in input order.
+# At most `window` pages are in flight or fetched but not yet yielded; a new fetch starts as soon as the
+# oldest page is handed on, so one slow page only holds back the others once the window is full.
+async def fetch_all(urls, fetch, max_concurrency=MAX_CONCURRENCY, per_host_concurrency=PER_HOST_CONCURRENCY, window=WINDOW_PAGES):
+    loop = asyncio.get_running_loop()
+    global_limit = asyncio.Semaphore(max_concurrency)
+    host_limits = {}
+
+    async def fetch_one(url):
+        host = urlparse(url).netloc
+        if host not in host_limits:
+            host_limits[host] = asyncio.Semaphore(per_host_concurrency)
+        async with global_limit, host_limits[host]:
+            return await loop.run_in_executor(executor, fetch, url)
+
+    pending = deque()  # (url, task) in input order; completed tasks wait here until their turn
+    remaining = iter(urls)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        try:
+            for url in islice(remaining, window):
+                pending.append((url, asyncio.ensure_future(fetch_one(url))))
+            while pending:
+                url, task = pending.popleft()
+                page = await task
+                for next_url in islice(remaining, 1):
+                    pending.append((next_url, asyncio.ensure_future(fetch_one(next_url))))
+                yield url, page
+        finally:
+            for _, task in pending:
+                task.cancel()
+            await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+
+# Function to iterate over (url, html) pairs, either concurrently or one at a time
+def iter_pages(urls, fetch, sequential=False, max_concurrency=MAX_CONCURRENCY, per_host_concurrency=PER_HOST_CONCURRENCY, window=WINDOW_PAGES):
+    if sequential:
+        for url in urls:
+            yield url, fetch(url)
+        return
+
+    loop = asyncio.new_event_loop()
+    pages = fetch_all(urls, fetch, max_concurrency, per_host_concurrency, window)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(pages.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(pages.aclose())
+        loop.close()
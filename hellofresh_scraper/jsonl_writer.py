@@ -0,0 +1,60 @@
+import os
+import json
+
+# Default number of records between fsync calls
+FSYNC_EVERY = 100
+
+# Class to append one compact JSON record per line, flushing every record and fsyncing on a cadence
+class JsonlWriter:
+    def __init__(self, path, fsync_every=FSYNC_EVERY, append=False):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.unsynced = 0
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self.file.flush()
+        self.unsynced += 1
+        if self.fsync_every and self.unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+# Function to stream the records of a JSONL file, dropping a partial last line left by a crash
+def read_jsonl(path):
+    if not os.path.exists(path):
+        return
+    good_size = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            good_size += len(line)
+            yield record
+    if good_size != os.path.getsize(path):
+        print(f"Truncating incomplete record at the end of {path}")
+        with open(path, 'r+b') as f:
+            f.truncate(good_size)
+
+# Function to convert a JSONL file into the legacy pretty-printed JSON array, one record in memory at a time.
+# The output is byte-for-byte what json.dump(records, f, indent=4) would have written.
+def jsonl_to_json(jsonl_path, json_path):
+    with open(json_path, 'w') as out:
+        first = True
+        for record in read_jsonl(jsonl_path):
+            out.write('[\n' if first else ',\n')
+            first = False
+            out.write('\n'.join('    ' + line for line in json.dumps(record, indent=4).split('\n')))
+        out.write('[]' if first else '\n]')
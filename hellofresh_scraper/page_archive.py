@@ -0,0 +1,96 @@
+import os
+import json
+import gzip
+import time
+import threading
+import requests
+import common_path  # Makes scraper_common importable
+from scraper_common.http_client import http_get
+
+# A page archive is a file of concatenated gzip members, one per fetched page, each holding
+# a JSON header line (url, status, headers, encoding, fetched_at) followed by the raw body.
+# A sidecar '<archive>.idx' file lists url, offset and length of every member so single
+# pages can be read back without decompressing the whole archive.
+
+# Class to append fetched pages to an archive; safe to share between fetch threads
+class ArchiveWriter:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.archive_file = open(path, 'ab')
+        self.index_file = open(path + '.idx', 'a', encoding='utf-8')
+
+    def add(self, url, status, headers, body, encoding='utf-8'):
+        header = {'url': url, 'status': status, 'headers': dict(headers), 'encoding': encoding, 'fetched_at': time.time()}
+        member = gzip.compress(json.dumps(header).encode('utf-8') + b'\n' + body)
+        with self.lock:
+            offset = self.archive_file.tell()
+            self.archive_file.write(member)
+            self.archive_file.flush()
+            self.index_file.write(json.dumps({'url': url, 'offset': offset, 'length': len(member)}) + '\n')
+            self.index_file.flush()
+
+    # Function with the same contract as scrape_recipe.get_html that also records the response. The page is
+    # requested from fetch_url when given (e.g. a local stand-in server) but recorded under url, so the
+    # archive replays against the site's own URLs
+    def fetch(self, url, fetch_url=None):
+        try:
+            response = http_get(fetch_url or url)
+        except requests.RequestException as e:
+            print(f"Failed to retrieve page: {url} with error: {e}")
+            return None
+        self.add(url, response.status_code, response.headers, response.content, response.encoding or 'utf-8')
+        if response.status_code != 200:
+            print(f"Failed to retrieve page: {url} with status: {response.status_code}")
+            return None
+        return response.text
+
+    def close(self):
+        self.archive_file.close()
+        self.index_file.close()
+
+# Function to decode one gzip member back into a record dict
+def decode_member(member):
+    data = gzip.decompress(member)
+    header, body = data.split(b'\n', 1)
+    record = json.loads(header)
+    record['body'] = body
+    return record
+
+# Class to read pages back from an archive, by URL or in recorded order
+class ArchiveReader:
+    def __init__(self, path):
+        self.path = path
+        self.index = {}
+        index_path = path + '.idx'
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as index_file:
+                for line in index_file:
+                    entry = json.loads(line)
+                    self.index[entry['url']] = (entry['offset'], entry['length'])  # Later recordings win
+        self.archive_file = open(path, 'rb')
+
+    def get(self, url):
+        if url not in self.index:
+            return None
+        offset, length = self.index[url]
+        self.archive_file.seek(offset)
+        return decode_member(self.archive_file.read(length))
+
+    # Function with the same contract as scrape_recipe.get_html, served from the archive
+    def fetch(self, url):
+        record = self.get(url)
+        if record is None:
+            print(f"Page not in archive: {url}")
+            return None
+        if record['status'] != 200:
+            return None
+        return record['body'].decode(record['encoding'], errors='replace')
+
+    def __iter__(self):
+        for url, (offset, length) in self.index.items():
+            self.archive_file.seek(offset)
+            yield decode_member(self.archive_file.read(length))
+
+    def close(self):
+        self.archive_file.close()
@@ -1,18 +1,36 @@
 import os
+import re
 import json
+import argparse
 import requests
-from bs4 import BeautifulSoup
 import time
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit
+from async_fetch import iter_pages, MAX_CONCURRENCY, PER_HOST_CONCURRENCY, WINDOW_PAGES
+from page_archive import ArchiveWriter, ArchiveReader
+import common_path  # Makes scraper_common importable
+from scraper_common.parsing import make_soup
+from scraper_common.parse_pool import parse_in_pool, PARSE_WORKERS
+from scraper_common.http_client import http_get
+from jsonl_writer import JsonlWriter, read_jsonl, jsonl_to_json, FSYNC_EVERY
 
-def get_html(url):
+# Function to get a page's HTML, or None if it could not be fetched; fetch_url, when given, is requested
+# in place of url (e.g. the same page on a local stand-in server)
+def get_html(url, fetch_url=None):
     try:
-        response = requests.get(url)
+        response = http_get(fetch_url or url)
         response.raise_for_status()
         return response.text
     except requests.RequestException as e:
         print(f"Failed to retrieve page: {url} with error: {e}")
         return None
 
+# Function to point a URL at another server, keeping its path and query (e.g. a local archive_server.py)
+def rebase_url(url, base_url):
+    base = urlsplit(base_url)
+    parts = urlsplit(url)
+    return urlunsplit((base.scheme, base.netloc, base.path.rstrip('/') + parts.path, parts.query, parts.fragment))
+
 def get_recipe_links_from_file(file_path):
     with open(file_path, 'r') as file:
         data = json.load(file)
@@ -34,13 +52,102 @@ def replace_fractions(text):
         text = text.replace(frac, dec)
     return text
 
+# Function to fetch a recipe page and extract its details
 def scrape_recipe(recipe_url, tag):
-    recipe_data = {'tag': tag, 'url': recipe_url}
     html = get_html(recipe_url)
     if not html:
         return None
+    return parse_recipe(html, recipe_url, tag)
+
+# Image CDN prefixes used by the recipe page for the paths found in its embedded JSON
+HERO_IMAGE_BASE = 'https://img.hellofresh.com/f_auto,fl_lossy,q_auto,w_1200/hellofresh_s3'
+INGREDIENT_IMAGE_BASE = 'https://img.hellofresh.com/w_96,q_auto,f_auto,c_limit,fl_lossy/hellofresh_s3'
+STEP_IMAGE_BASE = 'https://img.hellofresh.com/w_750,q_auto,f_auto,c_limit,fl_lossy/hellofresh_s3'
+
+# Page containers parse_recipe_dom reads
+RECIPE_CONTAINERS = [
+    ('h1', None, None),
+    ('div', 'data-test-id', 'recipe-hero-image'),
+    ('div', 'class', 'ceEdmx'),
+    ('div', 'data-test-id', 'instructions'),
+]
+
+NEXT_DATA_PATTERN = re.compile(r'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL)
+
+# Function to extract recipe details from already fetched HTML, preferring the embedded page JSON
+def parse_recipe(html, recipe_url, tag):
+    recipe_json = find_embedded_recipe(html)
+    if recipe_json:
+        return parse_recipe_json(recipe_json, recipe_url, tag)
+    return parse_recipe_dom(html, recipe_url, tag)
+
+# Function to locate the recipe object in the page's __NEXT_DATA__ script without parsing the HTML tree
+def find_embedded_recipe(html):
+    match = NEXT_DATA_PATTERN.search(html)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(1))
+    except ValueError:
+        return None
+
+    # Breadth-first search for the first object that looks like a recipe
+    queue = deque([data])
+    while queue:
+        node = queue.popleft()
+        if isinstance(node, dict):
+            if isinstance(node.get('steps'), list) and isinstance(node.get('ingredients'), list) and 'name' in node:
+                return node
+            queue.extend(node.values())
+        elif isinstance(node, list):
+            queue.extend(node)
+    return None
+
+# Function to format an ingredient amount the way replace_fractions renders it (0.5, 0.333, 2)
+def format_amount(amount):
+    if amount is None:
+        return ''
+    return f"{round(float(amount), 3):g}"
+
+# Function to map the embedded recipe JSON to the scraped record shape
+def parse_recipe_json(recipe_json, recipe_url, tag):
+    recipe_data = {'tag': tag, 'url': recipe_url}
+    recipe_data['title'] = (recipe_json.get('name') or '').strip() or 'No title found'
+    image_path = recipe_json.get('imagePath')
+    recipe_data['hero_image_url'] = HERO_IMAGE_BASE + image_path if image_path else ''
+
+    # Amounts are listed per serving size; the page shows the first one
+    yields = recipe_json.get('yields') or []
+    amounts = {item.get('id'): item for item in (yields[0].get('ingredients') or [])} if yields else {}
+
+    recipe_data['ingredients'] = []
+    for ingredient in recipe_json.get('ingredients') or []:
+        if ingredient.get('shipped') is False:
+            continue
+        amount = amounts.get(ingredient.get('id'), {})
+        unit_text = ' '.join(part for part in [format_amount(amount.get('amount')), amount.get('unit') or ''] if part)
+        image_path = ingredient.get('imagePath')
+        recipe_data['ingredients'].append({
+            'name': (ingredient.get('name') or '').strip(),
+            'unit': unit_text,
+            'image_url': INGREDIENT_IMAGE_BASE + image_path if image_path else ''
+        })
+
+    recipe_data['instructions'] = []
+    for step in sorted(recipe_json.get('steps') or [], key=lambda step: step.get('index') or 0):
+        images = step.get('images') or []
+        image_path = images[0].get('path') if images else None
+        recipe_data['instructions'].append({
+            'text': replace_fractions((step.get('instructions') or '').strip()),
+            'image_url': STEP_IMAGE_BASE + image_path if image_path else ''
+        })
+
+    return recipe_data
 
-    soup = BeautifulSoup(html, 'html.parser')
+# Function to extract recipe details by walking the HTML tree, used when the page has no embedded JSON
+def parse_recipe_dom(html, recipe_url, tag):
+    recipe_data = {'tag': tag, 'url': recipe_url}
+    soup = make_soup(html, RECIPE_CONTAINERS)
     
     # Extract title
     title_tag = soup.find('h1')
@@ -85,34 +192,113 @@ def scrape_recipe(recipe_url, tag):
 
     return recipe_data
 
-def main():
-    directory = 'recipesjsonfolder'
-    scraped_data = []
-    count = 0
-    limit = 10000  # Limit the number of recipes to scrape
-    seen_titles = set()  # Set to track seen titles
-
-    for filename in os.listdir(directory):
+# Function to list (link, tag) pairs from every category file, in a stable order
+def get_tagged_links(directory):
+    tagged_links = []
+    for filename in sorted(os.listdir(directory)):
         if filename.endswith('.json'):
             tag = filename.replace('.json', '')
             file_path = os.path.join(directory, filename)
             recipe_links = get_recipe_links_from_file(file_path)
-            
             print(f"Processing {len(recipe_links)} recipes in category: {tag}")
-            
-            for link in recipe_links:
-                if count >= limit:
-                    break
-                recipe = scrape_recipe(link, tag)
-                if recipe and recipe['title'] not in seen_titles:
-                    scraped_data.append(recipe)
-                    seen_titles.add(recipe['title'])
-                    count += 1
-                    print(f"Scraped recipe: {recipe['title']} from {tag}")
-
-    # Output the scraped data to a JSON file
-    with open('scraped_recipes.json', 'w') as f:
-        json.dump(scraped_data, f, indent=4)
+            tagged_links.extend((link, tag) for link in recipe_links)
+    return tagged_links
+
+RECIPE_ID_PATTERN = re.compile(r'([0-9a-f]{24})/?(?:[?#].*)?$')
+
+# Function to get the canonical recipe ID (the trailing 24-hex id) of a recipe URL, or the URL itself
+def recipe_id(url):
+    match = RECIPE_ID_PATTERN.search(url)
+    return match.group(1) if match else url
+
+# Function to plan the crawl: one (link, tags) entry per recipe ID, in order of first appearance
+def plan_recipe_links(directory):
+    tagged_links = get_tagged_links(directory)
+    planned = {}
+    for link, tag in tagged_links:
+        key = recipe_id(link)
+        if key not in planned:
+            planned[key] = (link, [tag])
+        elif tag not in planned[key][1]:
+            planned[key][1].append(tag)
+    print(f"Planned {len(planned)} unique recipes from {len(tagged_links)} links")
+    return list(planned.values())
+
+def main(directory='recipesjsonfolder', limit=10000, sequential=False, max_concurrency=MAX_CONCURRENCY, per_host_concurrency=PER_HOST_CONCURRENCY, record=None, replay=None, workers=PARSE_WORKERS,
+         output='scraped_recipes.json', fsync_every=FSYNC_EVERY, resume=False, base_url=None, window=WINDOW_PAGES):
+    count = 0
+    seen_titles = set()  # Set to track seen titles
+    done_ids = set()
+
+    # Recipes are streamed to a JSONL file as they finish; on resume, pick up where it stopped
+    jsonl_path = os.path.splitext(output)[0] + '.jsonl'
+    if resume:
+        for recipe in read_jsonl(jsonl_path):
+            seen_titles.add(recipe['title'])
+            done_ids.add(recipe_id(recipe['url']))
+            count += 1
+        print(f"Resuming after {count} recipes already in {jsonl_path}")
+    writer = JsonlWriter(jsonl_path, fsync_every, append=resume)
+
+    # Pick where pages come from: the network, the network while recording, or a recorded archive
+    archive = None
+    fetch = get_html
+    if replay:
+        archive = ArchiveReader(replay)
+        fetch = archive.fetch
+        sequential = True  # Local disk reads gain nothing from the async engine
+    elif record:
+        archive = ArchiveWriter(record)
+        fetch = archive.fetch
+    if base_url and not replay:
+        # Pages are fetched from base_url but keep their original URLs in the output and in a recorded archive
+        site_fetch = fetch
+        fetch = lambda url: site_fetch(url, rebase_url(url, base_url))
+
+    # Each recipe ID is fetched once, however many category files list it
+    planned_links = [(link, tags) for link, tags in plan_recipe_links(directory) if recipe_id(link) not in done_ids]
+    tags_by_link = dict(planned_links)
+    links = [link for link, _ in planned_links]
+    pages = iter_pages(links, fetch, sequential, max_concurrency, per_host_concurrency, window)
+
+    # Raw pages go to a pool of parser processes; results come back in the same order
+    # as planned_links, so deduplication and output stay deterministic
+    jobs = ((html, link, tags[0]) for (link, tags), (_, html) in zip(planned_links, pages) if html)
+    recipes = parse_in_pool(jobs, parse_recipe, workers)
+    for recipe in recipes:
+        if count >= limit:
+            break
+        recipe['tags'] = tags_by_link[recipe['url']]  # Every category that lists this recipe
+        if recipe['title'] not in seen_titles:
+            writer.write(recipe)
+            seen_titles.add(recipe['title'])
+            count += 1
+            print(f"Scraped recipe: {recipe['title']} from {recipe['tag']}")
+    recipes.close()
+    pages.close()
+    if archive:
+        archive.close()
+    writer.close()
+
+    # Convert the streamed records to the pretty JSON array other tools read
+    jsonl_to_json(jsonl_path, output)
+    print(f"Saved {count} recipes to {output}")
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Scrape HelloFresh recipes listed in the category link files.')
+    parser.add_argument('--directory', default='recipesjsonfolder', help='Folder of <tag>.json link lists')
+    parser.add_argument('--limit', type=int, default=10000, help='Maximum number of recipes to scrape')
+    parser.add_argument('--sequential', action='store_true', help='Fetch pages one at a time instead of concurrently')
+    parser.add_argument('--max-concurrency', type=int, default=MAX_CONCURRENCY, help='Maximum requests in flight overall')
+    parser.add_argument('--per-host-concurrency', type=int, default=PER_HOST_CONCURRENCY, help='Maximum requests in flight per host')
+    parser.add_argument('--record', metavar='ARCHIVE', help='Store every fetched page in this archive')
+    parser.add_argument('--replay', metavar='ARCHIVE', help='Re-extract recipes from this archive instead of the network')
+    parser.add_argument('--workers', type=int, default=PARSE_WORKERS, help='Parser processes (0 parses in the main process)')
+    parser.add_argument('--output', default='scraped_recipes.json', help='Final JSON array; records stream to the matching .jsonl file')
+    parser.add_argument('--fsync-every', type=int, default=FSYNC_EVERY, help='Records between fsyncs of the JSONL file (0 only syncs at the end)')
+    parser.add_argument('--resume', action='store_true', help='Keep the existing JSONL file and skip recipes already in it')
+    parser.add_argument('--base-url', help='Fetch recipe pages from this server instead, e.g. http://localhost:8000 for archive_server.py')
+    parser.add_argument('--window', type=int, default=WINDOW_PAGES, help='Pages in flight or waiting to be handed on in order')
+    args = parser.parse_args()
+    main(args.directory, args.limit, args.sequential, args.max_concurrency, args.per_host_concurrency, args.record, args.replay, args.workers,
+         args.output, args.fsync_every, args.resume, args.base_url, args.window)
@@ -1,13 +1,14 @@
-import requests
 from bs4 import BeautifulSoup
 import json
+import common_path  # Makes scraper_common importable
+from scraper_common.http_client import http_get
 
 # Base URL of the HelloFresh website
 base_url = "https://www.hellofresh.com"
 
 # Function to get the HTML content of a page
 def get_html(url):
-    response = requests.get(url)
+    response = http_get(url)
     response.raise_for_status()  # Raise an HTTPError for bad responses
     return response.text
 
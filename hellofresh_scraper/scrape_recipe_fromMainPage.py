@@ -1,10 +1,11 @@
-import requests
 from bs4 import BeautifulSoup
 import json
-import time
+import common_path  # Makes scraper_common importable
+from scraper_common.http_client import http_get
+from scraper_common.rate_limit import rate_metrics
 
 def get_html(url):
-    response = requests.get(url)
+    response = http_get(url)
     if response.status_code == 200:
         return response.text
     else:
@@ -105,10 +106,7 @@ def main():
 
     for category in category_links:
         tag = category['tag']
-        print(f"Processing category: {tag}")
-        
-        # Adding a delay to allow the page to load
-        time.sleep(0.5)
+        print(f"Processing category: {tag} (request rates: {rate_metrics()})")
         
         recipe_links = get_recipe_links(category['url'])
         print(f"Found {len(recipe_links)} recipes in category: {tag}")
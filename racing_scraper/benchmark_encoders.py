@@ -0,0 +1,79 @@
+import io
+import time
+import argparse
+import tracemalloc
+import joblib
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+from gear_codes import GEAR_CODES
+from race_loader import read_race_csv
+from race_prep import prepare_records, NUMERICAL_FEATURES, CATEGORICAL_FEATURES, LOW_CARDINALITY_FEATURES
+from race_encoders import make_preprocessor, ENCODERS
+
+MODEL_NUMERICAL_FEATURES = NUMERICAL_FEATURES + GEAR_CODES
+
+# Categorical features of the previous pipeline, which one-hot encoded horse number and horse name separately
+LEGACY_CATEGORICAL_FEATURES = ['Horse Number', 'Horse Name', 'Trainer', 'Jockey'] + LOW_CARDINALITY_FEATURES
+
+# Function to build the previous preprocessing, with every categorical feature one-hot encoded
+def legacy_preprocessor():
+    return ColumnTransformer(
+        transformers=[
+            ('num', Pipeline(steps=[
+                ('imputer', SimpleImputer(strategy='mean')),
+                ('scaler', StandardScaler())
+            ]), MODEL_NUMERICAL_FEATURES),
+            ('cat', OneHotEncoder(handle_unknown='ignore'), LEGACY_CATEGORICAL_FEATURES)
+        ])
+
+# Function to fit one pipeline, reporting its encoded width, fit time, peak traced memory, size on disk and test MAE
+def evaluate(preprocessor, X_train, X_test, y_train, y_test, trees):
+    model = Pipeline(steps=[
+        ('preprocessor', preprocessor),
+        ('regressor', RandomForestRegressor(n_estimators=trees, random_state=42, n_jobs=-1))
+    ])
+    tracemalloc.start()
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    width = len(model.named_steps['preprocessor'].get_feature_names_out())
+    mae = mean_absolute_error(y_test, model.predict(X_test))
+    return width, fit_seconds, peak / 1024 ** 2, buffer.getbuffer().nbytes / 1024 ** 2, mae
+
+# Main function to compare the high-cardinality encoders with the previous all one-hot pipeline on one distance
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark high-cardinality encoders for the finish-time model.')
+    parser.add_argument('csv', help='Race records CSV')
+    parser.add_argument('--distance', type=float, default=1200, help='Distance to train on')
+    parser.add_argument('--trees', type=int, default=100, help='Trees per forest')
+    parser.add_argument('--encoders', nargs='+', choices=list(ENCODERS), default=list(ENCODERS), help='Encoders to compare')
+    args = parser.parse_args()
+
+    data = prepare_records(read_race_csv('records', args.csv))
+    data = data[data['Distance'] == args.distance]
+    for column in ['Horse Number', 'Horse Name']:
+        data[column] = data[column].astype('string').fillna('').astype(str)
+    X = data[list(dict.fromkeys(LEGACY_CATEGORICAL_FEATURES + CATEGORICAL_FEATURES + MODEL_NUMERICAL_FEATURES))]
+    X_train, X_test, y_train, y_test = train_test_split(X, data['Finish Time'], test_size=0.2, random_state=42)
+    print(f"{len(X_train)} training rows at distance {args.distance:g}; "
+          f"{X_train[['Horse Number', 'Trainer', 'Jockey']].nunique().to_dict()} distinct values")
+
+    candidates = [('onehot (before)', legacy_preprocessor())]
+    candidates += [(encoder, make_preprocessor(MODEL_NUMERICAL_FEATURES, encoder)) for encoder in args.encoders]
+    print(f"{'encoder':16} {'columns':>8} {'fit s':>8} {'peak MB':>9} {'disk MB':>9} {'MAE s':>7}")
+    for name, preprocessor in candidates:
+        width, fit_seconds, peak_mb, disk_mb, mae = evaluate(preprocessor, X_train, X_test, y_train, y_test, args.trees)
+        print(f"{name:16} {width:8} {fit_seconds:8.2f} {peak_mb:9.1f} {disk_mb:9.1f} {mae:7.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import io
+import time
+import argparse
+import joblib
+from sklearn.metrics import mean_absolute_error
+from gear_codes import GEAR_CODES
+from race_loader import read_race_csv
+from race_prep import prepare_records, NUMERICAL_FEATURES, CATEGORICAL_FEATURES
+from race_models import fit_forest_model, fit_boosting_model, FOREST_PARAM_GRID
+
+MODEL_NUMERICAL_FEATURES = NUMERICAL_FEATURES + GEAR_CODES
+MODEL_FEATURES = CATEGORICAL_FEATURES + MODEL_NUMERICAL_FEATURES
+
+# Runners in a typical race, the batch size predicted for one race card
+RACE_RUNNERS = 12
+
+# Function to time one engine on a distance: fit time, predict latency for one race and for the whole test
+# set, size on disk and MAE on the test races
+def evaluate(fit, train, test, repeat):
+    start = time.perf_counter()
+    model = fit(train[MODEL_FEATURES], train['Finish Time'], train['Date'])
+    fit_seconds = time.perf_counter() - start
+
+    race = test[MODEL_FEATURES].head(RACE_RUNNERS)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        model.predict(race)
+    race_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    start = time.perf_counter()
+    predicted = model.predict(test[MODEL_FEATURES])
+    test_ms = (time.perf_counter() - start) * 1000
+
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return fit_seconds, race_ms, test_ms, buffer.getbuffer().nbytes / 1024 ** 2, mean_absolute_error(test['Finish Time'], predicted)
+
+# Main function to compare the forest and the boosting engine per distance, testing on the most recent races
+def main():
+    parser = argparse.ArgumentParser(description='Compare the forest and gradient boosting finish-time models.')
+    parser.add_argument('csv', help='Race records CSV')
+    parser.add_argument('--distances', type=float, nargs='+', help='Distances to compare (default: all)')
+    parser.add_argument('--test-fraction', type=float, default=0.2, help='Share of the most recent races used for testing')
+    parser.add_argument('--grid', action='store_true', help='Grid search the forest as prediction.py does (slow)')
+    parser.add_argument('--encoder', default='target', help='High-cardinality encoder of the forest (see race_encoders.ENCODERS)')
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per race-card latency measurement')
+    args = parser.parse_args()
+
+    data = prepare_records(read_race_csv('records', args.csv)).sort_values('Date', kind='stable')
+    engines = {
+        'forest': lambda X, y, dates: fit_forest_model(X, y, MODEL_NUMERICAL_FEATURES, args.encoder, param_grid=FOREST_PARAM_GRID if args.grid else None),
+        'boosting': lambda X, y, dates: fit_boosting_model(X, y, MODEL_NUMERICAL_FEATURES, dates=dates),
+    }
+
+    print(f"{'distance':>8} {'engine':10} {'rows':>6} {'fit s':>8} {'race ms':>8} {'test ms':>8} {'disk MB':>8} {'MAE s':>7}")
+    for distance in args.distances or sorted(data['Distance'].dropna().unique()):
+        races = data[data['Distance'] == distance]
+        split = int(len(races) * (1 - args.test_fraction))
+        train, test = races.iloc[:split], races.iloc[split:]
+        for engine, fit in engines.items():
+            fit_seconds, race_ms, test_ms, disk_mb, mae = evaluate(fit, train, test, args.repeat)
+            print(f"{distance:8g} {engine:10} {len(train):6} {fit_seconds:8.2f} {race_ms:8.2f} {test_ms:8.1f} {disk_mb:8.2f} {mae:7.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import io
+import time
+import argparse
+from contextlib import redirect_stdout
+import common_path  # Makes scraper_common importable
+from scraper_common.parsing import make_soup
+from horse_info import parse_horse_details, build_label_map, get_value
+
+# Labels parse_horse_details resolves on every page
+PROFILE_LABELS = ['Country of Origin / Age', 'Colour / Sex', 'Import Type', 'Season Stakes*', 'Total Stakes*',
+                  'No. of 1-2-3-Starts*', 'No. of starts in past 10race meetings', 'Current Stable Location(Arrival Date)',
+                  'Import Date', 'Trainer', 'Owner', 'Current Rating', 'Start ofSeason Rating', 'Sire', 'Dam', "Dam's Sire"]
+
+# Function with the previous lookup: a full scan of every <td> for each label
+def scan_value(soup, label):
+    for td in soup.find_all('td'):
+        if label in td.get_text():
+            next_td = td.find_next_sibling('td')
+            if next_td:
+                value_td = next_td.find_next_sibling('td')
+                if value_td:
+                    return value_td.get_text(strip=True)
+    return ''
+
+# Function with the current lookup: one pass to build the label map, then dictionary lookups
+def map_values(soup):
+    label_map = build_label_map(soup)
+    return [get_value(label_map, label) for label in PROFILE_LABELS]
+
+# Function to time fn(soup) over every page, returning milliseconds per page and the last outputs
+def time_per_page(fn, soups, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        outputs = [fn(soup) for soup in soups]
+    return (time.perf_counter() - start) * 1000 / (repeat * len(soups)), outputs
+
+# Main function to compare per-label scans with the single-pass label map on saved horse pages
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark horse profile label lookups on saved Horse.aspx pages.')
+    parser.add_argument('pages', nargs='+', help='Saved horse detail pages')
+    parser.add_argument('--repeat', type=int, default=20, help='Times to extract each page')
+    args = parser.parse_args()
+
+    soups = []
+    for path in args.pages:
+        with open(path, 'rb') as f:
+            soups.append(make_soup(f.read()))
+
+    before, scanned = time_per_page(lambda soup: [scan_value(soup, label) for label in PROFILE_LABELS], soups, args.repeat)
+    after, mapped = time_per_page(map_values, soups, args.repeat)
+    with redirect_stdout(io.StringIO()):
+        full, _ = time_per_page(lambda soup: parse_horse_details(soup, 'saved?HorseId=saved'), soups, args.repeat)
+
+    print(f"per-label scans:   {before:8.2f} ms/page")
+    print(f"single-pass map:   {after:8.2f} ms/page ({before / after:.1f}x faster)")
+    print(f"full profile:      {full:8.2f} ms/page")
+    print(f"pages with different values: {sum(a != b for a, b in zip(scanned, mapped))}")
+    # Labels missing from the map fall back to a substring scan of every key, as slow as the old lookup
+    hits = sum(label in build_label_map(soup) for soup in soups for label in PROFILE_LABELS)
+    print(f"labels found by exact key: {hits} of {len(soups) * len(PROFILE_LABELS)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import sys
+import time
+import ctypes
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from race_types import TABLES
+from race_loader import read_race_csv, iter_race_csv, CHUNK_ROWS
+
+try:
+    import resource
+except ImportError:  # Windows, where the peak working set is read through ctypes instead
+    resource = None
+
+# Layout of the Windows PROCESS_MEMORY_COUNTERS structure filled by GetProcessMemoryInfo
+class ProcessMemoryCounters(ctypes.Structure):
+    _fields_ = [('cb', ctypes.c_ulong), ('PageFaultCount', ctypes.c_ulong)] + [
+        (field, ctypes.c_size_t) for field in ('PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                                               'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage',
+                                               'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+# Function to get the peak resident memory of this process in MB. ru_maxrss is in kilobytes on Linux and
+# in bytes on macOS; on Windows the peak working set is the equivalent.
+def peak_rss_mb():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+    kernel32 = ctypes.WinDLL('kernel32')
+    kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+    psapi = ctypes.WinDLL('psapi')
+    psapi.GetProcessMemoryInfo.argtypes = [ctypes.c_void_p, ctypes.POINTER(ProcessMemoryCounters), ctypes.c_ulong]
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        raise ctypes.WinError()
+    return counters.PeakWorkingSetSize / 1024 ** 2
+
+# Rows loaded first to pull in the code a loader runs, so its fixed cost is told apart from its data
+WARM_UP_ROWS = 100
+
+# Function to load a CSV in a fresh process and report its peak memory growth (in total and after a warm-up
+# load of the first rows), the loaded frame's size and the load time
+def measure(loader, name, path, usecols, chunksize):
+    rss_before = peak_rss_mb()
+    if loader == 'read_csv':
+        pd.read_csv(path, usecols=usecols, nrows=WARM_UP_ROWS)
+    else:
+        next(iter_race_csv(name, path, usecols=usecols, chunksize=WARM_UP_ROWS))
+    rss_warm = peak_rss_mb()
+    start = time.perf_counter()
+    if loader == 'read_csv':
+        data = pd.read_csv(path, usecols=usecols)
+    else:
+        data = read_race_csv(name, path, usecols=usecols, chunksize=chunksize)
+    seconds = time.perf_counter() - start
+    rss_peak = peak_rss_mb()
+    return rss_peak - rss_before, rss_peak - rss_warm, data.memory_usage(deep=True).sum() / 1024 ** 2, seconds, len(data)
+
+# Main function to compare a bare pd.read_csv with the typed loader on a scraped CSV
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark memory of the typed race CSV loader against pd.read_csv.')
+    parser.add_argument('table', choices=list(TABLES), help='Table the CSV holds')
+    parser.add_argument('csv', nargs='?', help='CSV to load (default: the table\'s scraper output)')
+    parser.add_argument('--usecols', nargs='+', help='Columns to load (default: all)')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_ROWS, help='Rows parsed per chunk by the typed loader')
+    args = parser.parse_args()
+    path = args.csv or TABLES[args.table]['csv']
+
+    # Each loader runs in its own fresh process so peak memory is not shared between them
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for loader in ('read_csv', 'read_race_csv'):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[loader] = executor.submit(measure, loader, args.table, path, args.usecols, args.chunksize).result()
+
+    for loader, (peak_mb, data_mb, frame_mb, seconds, rows) in results.items():
+        print(f"{loader:14} {rows} rows, frame {frame_mb:8.2f} MB, peak RSS growth {peak_mb:8.2f} MB "
+              f"({data_mb:8.2f} MB after warm-up), {seconds * 1000:8.1f} ms")
+    baseline, typed = results['read_csv'], results['read_race_csv']
+    # Ratios of the loader to read_csv: below 1 the loader uses less
+    print(f"loader / read_csv: frame {typed[2] / baseline[2]:.2f}x, peak RSS growth {typed[0] / max(baseline[0], 0.01):.2f}x "
+          f"({typed[1] / max(baseline[1], 0.01):.2f}x after warm-up)")
+
+if __name__ == "__main__":
+    main()
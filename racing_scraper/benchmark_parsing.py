@@ -0,0 +1,59 @@
+import io
+import time
+import argparse
+from contextlib import redirect_stdout
+import common_path  # Makes scraper_common importable
+from scraper_common.parsing import make_soup, available_backends
+from racing_result import parse_race_data, RESULT_CONTAINERS
+from racing_field import parse_field_info, FIELD_CONTAINERS
+from horse_info import parse_horse_details
+from horse_racing_record import parse_race_records, RECORD_CONTAINERS
+
+# Function to run the race page extractors (results table and race tab) on one saved page
+def extract_race_page(html, backend):
+    results = parse_race_data(make_soup(html, RESULT_CONTAINERS, backend), 'saved', '01/01/2000', 1)
+    field = parse_field_info(make_soup(html, FIELD_CONTAINERS, backend), 'saved', '01/01/2000', 1)
+    return results, field
+
+# Function to run the horse page extractors (profile and form table) on one saved page
+def extract_horse_page(html, backend):
+    details = parse_horse_details(make_soup(html, None, backend), 'saved?HorseId=saved')
+    records = parse_race_records(make_soup(html, RECORD_CONTAINERS, backend), 'saved?HorseId=saved')
+    return details, records
+
+EXTRACTORS = {'race': extract_race_page, 'horse': extract_horse_page}
+
+# Main function to time every installed backend on saved pages and check they agree with html.parser
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HTML parser backends on saved HKJC pages.')
+    parser.add_argument('kind', choices=EXTRACTORS.keys(), help='Which extractors the saved pages are for')
+    parser.add_argument('pages', nargs='+', help='Saved LocalResults.aspx or Horse.aspx pages')
+    parser.add_argument('--repeat', type=int, default=5, help='Times to extract each page per backend')
+    args = parser.parse_args()
+
+    extract = EXTRACTORS[args.kind]
+    pages = []
+    for path in args.pages:
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+
+    baseline = None
+    timings = {}
+    mismatches = {}
+    for backend in reversed(available_backends()):  # html.parser first, as the reference output
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):  # Silence the extractors' progress prints
+            for _ in range(args.repeat):
+                outputs = [extract(html, backend) for html in pages]
+        timings[backend] = (time.perf_counter() - start) / (args.repeat * len(pages))
+        if baseline is None:
+            baseline = outputs
+        mismatches[backend] = sum(output != expected for output, expected in zip(outputs, baseline))
+
+    reference = timings['html.parser']
+    print(f"{'backend':<12} {'ms/page':>10} {'speedup':>8} {'mismatches':>11}")
+    for backend, seconds in timings.items():
+        print(f"{backend:<12} {seconds * 1000:>10.2f} {reference / seconds:>7.1f}x {mismatches[backend]:>11}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from gear_codes import expand_gear, GEAR_MASK_COLUMN
+from race_types import parse_race_time
+from race_prep import prepare_records, NUMERICAL_FEATURES, CATEGORICAL_FEATURES, HORSE_ID
+
+# Function with the previous row-wise parser, which only understands '1.11.47'
+def time_to_seconds(time_str):
+    try:
+        if '.' in time_str:
+            parts = time_str.split('.')
+            if len(parts) == 3:
+                minutes = int(parts[0])
+                seconds = int(parts[1])
+                milliseconds = int(parts[2])
+                return minutes * 60 + seconds + milliseconds / 100
+        return np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+# Function with the previous preparation: row-wise time parsing, gear columns found by prefix,
+# apply(pd.to_numeric) over every numeric column and a per-column loop over the gear flags
+def legacy_prepare(data):
+    data = data.copy()
+    data['Finish Time'] = data['Finish Time'].apply(time_to_seconds)
+    data['Distance'] = pd.to_numeric(data['Distance'], errors='coerce')
+    extra_numerical_features = [col for col in data.columns if col.startswith(('B', 'BO', 'CC', 'CP', 'CO', 'E', 'H', 'P', 'PC', 'PS', 'SB', 'SR', 'TT', 'V', 'VO', 'XB'))]
+    extra_numerical_features = [col for col in extra_numerical_features if col not in ['Horse Number', 'Horse Name']]
+    all_numerical_features = NUMERICAL_FEATURES + extra_numerical_features
+    data[all_numerical_features] = data[all_numerical_features].apply(pd.to_numeric, errors='coerce')
+    for col in extra_numerical_features:
+        data[col] = data[col].fillna(0).astype(int)
+    data.dropna(subset=['Finish Time'], inplace=True)
+    return data
+
+# Function to time fn(data), returning milliseconds per run and the last result
+def time_run(fn, data, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(data)
+    return (time.perf_counter() - start) * 1000 / repeat, result
+
+# Main function to compare the row-wise and vectorized preparation on a full dataset
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark race data preparation on a scraped CSV.')
+    parser.add_argument('csv', help='Race records CSV, or any CSV with a finish time column (e.g. race_results_full.csv)')
+    parser.add_argument('--time-column', default='Finish Time', help="Finish time column ('Finish time' in race results)")
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement')
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.csv)  # Read the way prediction.py always has, with inferred dtypes
+    times = data[args.time_column]
+    print(f"{len(data)} rows from {args.csv}")
+
+    before, legacy_seconds = time_run(lambda frame: frame.apply(time_to_seconds), times, args.repeat)
+    after, seconds = time_run(parse_race_time, times, args.repeat)
+    print(f"finish times row-wise:   {before:8.1f} ms, {legacy_seconds.notna().sum()} parsed")
+    print(f"finish times vectorized: {after:8.1f} ms, {seconds.notna().sum()} parsed ({before / after:.1f}x faster)")
+
+    # The horse id is derived from the horse number and name during preparation, so the raw CSV has those instead
+    raw_features = NUMERICAL_FEATURES + [column for column in CATEGORICAL_FEATURES if column != HORSE_ID] + ['Horse Number', 'Horse Name']
+    if all(column in data for column in raw_features):
+        records = data.rename(columns={args.time_column: 'Finish Time'})
+        if GEAR_MASK_COLUMN in records:
+            # The previous preparation expects one boolean column per gear code
+            legacy_records = pd.concat([records.drop(columns=[GEAR_MASK_COLUMN]), expand_gear(records[GEAR_MASK_COLUMN]).astype(bool)], axis=1)
+        else:
+            legacy_records = records
+        before, legacy = time_run(legacy_prepare, legacy_records, args.repeat)
+        after, prepared = time_run(prepare_records, records, args.repeat)
+        print(f"full preparation before: {before:8.1f} ms, {len(legacy)} rows kept")
+        print(f"full preparation after:  {after:8.1f} ms, {len(prepared)} rows kept ({before / after:.1f}x faster)")
+
+if __name__ == "__main__":
+    main()
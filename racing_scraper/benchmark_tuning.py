@@ -0,0 +1,66 @@
+import time
+import argparse
+import joblib
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import GridSearchCV, ParameterGrid
+from sklearn.pipeline import Pipeline
+from gear_codes import GEAR_CODES
+from race_loader import read_race_csv
+from race_prep import prepare_records, NUMERICAL_FEATURES, CATEGORICAL_FEATURES
+from race_encoders import make_preprocessor
+from race_models import fit_forest_model, split_jobs, FOREST_PARAM_GRID, TUNING_MODES
+
+MODEL_NUMERICAL_FEATURES = NUMERICAL_FEATURES + GEAR_CODES
+MODEL_FEATURES = CATEGORICAL_FEATURES + MODEL_NUMERICAL_FEATURES
+
+# Function with the previous search: every grid point on every fold, refitting the preprocessing each
+# time, with the search on all cores and each forest on one
+def legacy_search(X, y, encoder, cv):
+    model = Pipeline(steps=[
+        ('preprocessor', make_preprocessor(MODEL_NUMERICAL_FEATURES, encoder)),
+        ('regressor', RandomForestRegressor(random_state=42))
+    ])
+    grid_search = GridSearchCV(model, FOREST_PARAM_GRID, cv=cv, scoring='neg_mean_squared_error', n_jobs=-1)
+    return grid_search.fit(X, y).best_estimator_
+
+# Function to describe the forest settings a search picked
+def chosen_params(model):
+    params = model.named_steps['regressor'].get_params()
+    return ', '.join(f"{name.replace('regressor__', '')}={params[name.replace('regressor__', '')]}" for name in FOREST_PARAM_GRID)
+
+# Main function to compare the time and result of the forest hyperparameter searches on one distance
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the forest hyperparameter search.')
+    parser.add_argument('csv', help='Race records CSV')
+    parser.add_argument('--distance', type=float, default=1200, help='Distance to tune')
+    parser.add_argument('--rows', type=int, help='Use only the most recent rows of the distance')
+    parser.add_argument('--encoder', default='target', help='High-cardinality encoder (see race_encoders.ENCODERS)')
+    parser.add_argument('--cv', type=int, default=3, help='Cross-validation folds')
+    parser.add_argument('--test-fraction', type=float, default=0.2, help='Share of the most recent races used for testing')
+    parser.add_argument('--modes', nargs='+', choices=['before'] + TUNING_MODES, default=['before'] + TUNING_MODES, help='Searches to compare')
+    args = parser.parse_args()
+
+    data = prepare_records(read_race_csv('records', args.csv)).sort_values('Date', kind='stable')
+    races = data[data['Distance'] == args.distance]
+    if args.rows:
+        races = races.tail(args.rows)
+    split = int(len(races) * (1 - args.test_fraction))
+    train, test = races.iloc[:split], races.iloc[split:]
+    X_train, y_train = train[MODEL_FEATURES], train['Finish Time']
+    print(f"{len(train)} training and {len(test)} test rows at distance {args.distance:g}, {len(FOREST_PARAM_GRID)} searched parameters")
+    grid_fits = args.cv * len(ParameterGrid(FOREST_PARAM_GRID))
+    print(f"{joblib.cpu_count()} cores; search/forest jobs: before -1/1, grid {split_jobs(grid_fits)}, halving {split_jobs(1)}")
+
+    for mode in args.modes:
+        start = time.perf_counter()
+        if mode == 'before':
+            model = legacy_search(X_train, y_train, args.encoder, args.cv)
+        else:
+            model = fit_forest_model(X_train, y_train, MODEL_NUMERICAL_FEATURES, args.encoder, param_grid=FOREST_PARAM_GRID, cv=args.cv, tuning=mode)
+        seconds = time.perf_counter() - start
+        mae = mean_absolute_error(test['Finish Time'], model.predict(test[MODEL_FEATURES]))
+        print(f"{mode:8} {seconds:8.1f} s  test MAE {mae:.3f} s  ({chosen_params(model)})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Put the repository root on sys.path so scripts run from this folder can import the scraper_common package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,80 @@
+import os
+import json
+import time
+import sqlite3
+
+# Default journal file, shared by all crawls; each crawl keeps its own entries
+JOURNAL_PATH = 'crawl_journal.sqlite'
+
+# Entries older than this many seconds are dropped when a crawl opens its journal, so resuming a crawl
+# that was interrupted long ago fetches those pages again rather than reusing stale rows
+MAX_AGE = float(os.environ.get('CRAWL_JOURNAL_MAX_AGE', 2 * 24 * 3600))
+
+# Class to record each completed URL and the rows extracted from it, so an interrupted crawl can resume.
+# Failed URLs (fetch errors, error pages) are never journalled, so the next run fetches them again.
+# fresh=True discards whatever an earlier run of the crawl left behind.
+class CrawlJournal:
+    def __init__(self, crawl, path=JOURNAL_PATH, fresh=False, max_age=MAX_AGE):
+        self.crawl = crawl
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                crawl TEXT NOT NULL,
+                url TEXT NOT NULL,
+                rows TEXT NOT NULL,
+                done_at REAL NOT NULL,
+                UNIQUE (crawl, url)
+            )""")
+        if fresh:
+            self.connection.execute("DELETE FROM journal WHERE crawl = ?", (crawl,))
+        else:
+            self.connection.execute("DELETE FROM journal WHERE crawl = ? AND done_at < ?", (crawl, time.time() - max_age))
+        self.connection.commit()
+        self.done = {url for (url,) in self.connection.execute("SELECT url FROM journal WHERE crawl = ?", (crawl,))}
+        self.failed = set()
+        if self.done:
+            print(f"Resuming {crawl}: {len(self.done)} URLs already done")
+
+    def is_done(self, url):
+        return url in self.done
+
+    # Function to mark a URL as done together with its extracted rows (committed immediately)
+    def record(self, url, rows):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO journal (crawl, url, rows, done_at) VALUES (?, ?, ?, ?)",
+            (self.crawl, url, json.dumps(rows), time.time()))
+        self.connection.commit()
+        self.done.add(url)
+        self.failed.discard(url)
+
+    # Function to note a URL that failed in this run; it stays out of the journal
+    def record_failure(self, url):
+        self.failed.add(url)
+
+    # Function to iterate over every journalled row in the order the URLs were completed
+    def rows(self):
+        for (rows,) in self.connection.execute("SELECT rows FROM journal WHERE crawl = ? ORDER BY seq", (self.crawl,)):
+            yield from json.loads(rows)
+
+    # Function to count journalled URLs that produced at least one row
+    def count_with_rows(self):
+        return self.connection.execute("SELECT COUNT(*) FROM journal WHERE crawl = ? AND rows != '[]'", (self.crawl,)).fetchone()[0]
+
+    # Function to forget this crawl once its output has been written, so the next run starts fresh
+    def clear(self):
+        self.connection.execute("DELETE FROM journal WHERE crawl = ?", (self.crawl,))
+        self.connection.commit()
+        self.done = set()
+
+    # Function to end a run after its output was written. The journal only serves to resume an interrupted
+    # run, so it is cleared even when some URLs failed: those are reported and the next run fetches them
+    # again along with everything else, keeping its rows current (unchanged pages come from the HTTP cache)
+    def finish(self, output):
+        if self.failed:
+            print(f"{len(self.failed)} URLs failed and are missing from {output}; the next run fetches them again")
+        self.clear()
+        self.close()
+
+    def close(self):
+        self.connection.close()
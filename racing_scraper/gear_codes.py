@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+# Gear codes as listed on HKJC race records; each gear can carry a suffix:
+# '' (worn), '1' (first time), '2' (replaced) or '-' (removed)
+GEARS = ["B", "BO", "CC", "CP", "CO", "E", "H", "P", "PC", "PS", "SB", "SR", "TT", "V", "VO", "XB"]
+GEAR_SUFFIXES = ['', '1', '2', '-']
+
+# Code table: the position of a code is its bit in the gear mask (64 codes fit one unsigned 64-bit integer)
+GEAR_CODES = [f"{gear}{suffix}" for gear in GEARS for suffix in GEAR_SUFFIXES]
+GEAR_BITS = {code: 1 << i for i, code in enumerate(GEAR_CODES)}
+
+# Column race records store the gear mask in
+GEAR_MASK_COLUMN = 'Gear Mask'
+
+# Function to encode a gear field such as 'B/TT1' into its bitmask; unknown codes are ignored
+def encode_gear(gear_text):
+    mask = 0
+    for code in gear_text.split('/'):
+        mask |= GEAR_BITS.get(code.strip(), 0)
+    return mask
+
+# Function to decode a bitmask back into its gear codes, e.g. 65 -> ['B', 'E']
+def decode_gear(mask):
+    return [code for code, bit in GEAR_BITS.items() if mask & bit]
+
+# Function to expand a column of gear masks into one 0/1 uint8 column per gear code, vectorized
+def expand_gear(masks):
+    masks = pd.Series(masks)
+    values = masks.fillna(0).astype('uint64').to_numpy()
+    bits = (values[:, None] >> np.arange(len(GEAR_CODES), dtype=np.uint64)) & np.uint64(1)
+    return pd.DataFrame(bits.astype(np.uint8), columns=GEAR_CODES, index=masks.index)
+
+# Function to read per-code gear columns (booleans, 0/1 or 'True'/'False' text) as 0/1 uint8 flags in one pass
+def gear_flags_from_columns(data):
+    flags = data.reindex(columns=GEAR_CODES, fill_value=0)
+    text_columns = [code for code in GEAR_CODES if not pd.api.types.is_numeric_dtype(flags[code])]
+    if text_columns:
+        flags[text_columns] = flags[text_columns].isin(['True', 'true', '1', '1.0'])
+    return (flags == 1).astype(np.uint8)
+
+# Function to give a frame one 0/1 column per gear code, from its gear mask or, for files written
+# before the mask existed, from whatever boolean gear columns it has (missing codes become 0)
+def add_gear_flags(data):
+    if GEAR_MASK_COLUMN in data:
+        flags = expand_gear(data[GEAR_MASK_COLUMN])
+    else:
+        flags = gear_flags_from_columns(data)
+    return pd.concat([data.drop(columns=[code for code in GEAR_CODES if code in data]), flags], axis=1)
@@ -0,0 +1,78 @@
+import csv
+import argparse
+from horse_info import get_horse_links, parse_horse_details
+from horse_racing_record import parse_race_records
+from http_cache import fetch_content, invalidate
+import common_path  # Makes scraper_common importable
+from scraper_common.parsing import make_soup
+from crawl_journal import CrawlJournal
+from scraper_common.rate_limit import rate_metrics
+
+# Function to write a list of dicts to CSV using the keys of the first row as header
+def write_csv(rows, filename):
+    if not rows:
+        print(f"No rows to write to {filename}")
+        return
+    with open(filename, 'w', newline='', encoding='utf-8') as output_file:
+        dict_writer = csv.DictWriter(output_file, fieldnames=rows[0].keys())
+        dict_writer.writeheader()
+        dict_writer.writerows(rows)
+    print(f"Data saved to {filename}")
+
+# Function to fetch a horse detail page once and run both extractors on the same tree;
+# None if the fetch failed or the page is an error page
+def crawl_horse(horse_url):
+    print(f"Fetching details from URL: {horse_url}")
+    content = fetch_content(horse_url)
+    if content is None:
+        return None
+    soup = make_soup(content)  # parse_horse_details scans every <td>, so parse the whole page
+    horse_details = parse_horse_details(soup, horse_url)
+    race_records = parse_race_records(soup, horse_url)
+    if horse_details is None or race_records is None:
+        invalidate(horse_url)  # An error page served with status 200 is fetched again next time
+        return None
+    return horse_details, race_records
+
+# Main function to scrape horse profiles and race records in a single pass
+def main(fresh=False):
+    base_url = 'https://racing.hkjc.com/racing/information/english/Horse/SelectHorsebyChar.aspx?ordertype='
+    index_pages = [f"{base_url}{chr(i)}" for i in range(ord('A'), ord('Z') + 1)]
+
+    # Completed horse pages are journalled with their rows, tagged 'horse' or 'record', so an interrupted crawl resumes
+    journal = CrawlJournal('horse_crawl', fresh=fresh)
+    horse_count = journal.count_with_rows()
+    max_horses = 10000
+
+    for index_page in index_pages:
+        if horse_count >= max_horses:
+            break
+        horse_links = get_horse_links(index_page)
+        print(f"Current request rates: {rate_metrics()}")
+        for horse_link in horse_links:
+            if horse_count >= max_horses:
+                break
+            if journal.is_done(horse_link):
+                continue
+            horse = crawl_horse(horse_link)
+            if horse is None:  # Failed fetches and error pages stay out of the journal
+                journal.record_failure(horse_link)
+                continue
+            horse_details, race_records = horse
+            journal.record(horse_link, [['horse', horse_details]] + [['record', record] for record in race_records])
+            horse_count += 1
+
+    all_horses = []
+    all_race_records = []
+    for kind, row in journal.rows():
+        (all_horses if kind == 'horse' else all_race_records).append(row)
+
+    write_csv(all_horses, 'horses.csv')
+    write_csv(all_race_records, 'race_records.csv')
+    journal.finish('horses.csv and race_records.csv')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Scrape HKJC horse profiles and race records in a single pass.')
+    parser.add_argument('--fresh', action='store_true', help='Discard the journal of an interrupted run and start the crawl over')
+    args = parser.parse_args()
+    main(args.fresh)
@@ -1,12 +1,16 @@
-import requests
-from bs4 import BeautifulSoup
 import csv
-import time
+import argparse
+from http_cache import cached_get, fetch_content, invalidate
+import common_path  # Makes scraper_common importable
+from scraper_common.parsing import make_soup
+from crawl_journal import CrawlJournal
+from scraper_common.rate_limit import rate_metrics
+from racing_db import upsert_into_database
 
 # Function to get the horse detail page links from an index page
 def get_horse_links(index_url):
-    response = requests.get(index_url)
-    soup = BeautifulSoup(response.content, 'html.parser')
+    response = cached_get(index_url)
+    soup = make_soup(response.content, [('table', 'class', 'bigborder')])
     horse_links = []
     tables = soup.find_all('table', class_='bigborder')
     if len(tables) > 1:
@@ -16,35 +20,55 @@ def get_horse_links(index_url):
             horse_links.append('https://racing.hkjc.com' + link['href'])
     return horse_links
 
-# Helper function to extract text from a specific label
-def get_value(soup, label):
+# Function to build the label map of a horse page in one pass over its <td> cells.
+# Each cell that has a value two cells to its right is keyed by its stripped text, since the site pads
+# its label cells with line breaks and indentation; the first cell wins, matching the document-order
+# scan the lookups have always used.
+def build_label_map(soup):
+    label_map = {}
     for td in soup.find_all('td'):
-        if label in td.get_text():
-            next_td = td.find_next_sibling('td')
-            if next_td:
-                value_td = next_td.find_next_sibling('td')
-                if value_td:
-                    return value_td.get_text(strip=True)
-    return ''
+        next_td = td.find_next_sibling('td')
+        value_td = next_td.find_next_sibling('td') if next_td else None
+        if value_td:
+            label_map.setdefault(td.get_text(strip=True), value_td)
+    return label_map
+
+# Helper function to find the value cell for a label, by exact text or else the first cell containing it
+def find_value_td(label_map, label):
+    if label in label_map:
+        return label_map[label]
+    for text, value_td in label_map.items():
+        if label in text:
+            return value_td
+    return None
+
+# Helper function to extract text for a specific label
+def get_value(label_map, label):
+    value_td = find_value_td(label_map, label)
+    return value_td.get_text(strip=True) if value_td else ''
 
 # Helper function to extract the trainer ID from the <a> tag
-def get_trainer_id(soup):
-    for td in soup.find_all('td'):
-        if 'Trainer' in td.get_text():
-            next_td = td.find_next_sibling('td')
-            if next_td:
-                value_td = next_td.find_next_sibling('td')
-                if value_td:
-                    a_tag = value_td.find('a')
-                    if a_tag and 'href' in a_tag.attrs:
-                        return a_tag['href'].split('TrainerId=')[-1]
+def get_trainer_id(label_map):
+    value_td = find_value_td(label_map, 'Trainer')
+    a_tag = value_td.find('a') if value_td else None
+    if a_tag and 'href' in a_tag.attrs:
+        return a_tag['href'].split('TrainerId=')[-1]
     return ''
 
-# Function to scrape horse details from the horse detail page
+# Function to scrape horse details from the horse detail page; None if the fetch failed or the page is an error page
 def get_horse_details(horse_url):
     print(f"Fetching details from URL: {horse_url}")
-    response = requests.get(horse_url)
-    soup = BeautifulSoup(response.content, 'html.parser')
+    content = fetch_content(horse_url)
+    if content is None:
+        return None
+    soup = make_soup(content)  # Labels are looked up across every <td>, so parse the whole page
+    details = parse_horse_details(soup, horse_url)
+    if details is None:
+        invalidate(horse_url)  # An error page served with status 200 is fetched again next time
+    return details
+
+# Function to extract horse details from an already parsed horse detail page
+def parse_horse_details(soup, horse_url):
     details = {}
 
     try:
@@ -55,14 +79,16 @@ def get_horse_details(horse_url):
         print(f"Error: Unable to find horse name and ID for URL: {horse_url}")
         return None
 
-    country_age = get_value(soup, 'Country of Origin / Age')
+    label_map = build_label_map(soup)
+
+    country_age = get_value(label_map, 'Country of Origin / Age')
     if country_age:
         details['Country of Origin'], details['Age'] = [item.strip() for item in country_age.split('/')]
     else:
         details['Country of Origin'] = ''
         details['Age'] = ''
 
-    colour_sex = get_value(soup, 'Colour / Sex')
+    colour_sex = get_value(label_map, 'Colour / Sex')
     if colour_sex:
         parts = [item.strip() for item in colour_sex.split('/')]
         details['Sex'] = parts[-1]
@@ -71,13 +97,13 @@ def get_horse_details(horse_url):
         details['Colour'] = ''
         details['Sex'] = ''
 
-    details['Import Type'] = get_value(soup, 'Import Type')
-    details['Season Stakes*'] = get_value(soup, 'Season Stakes*')
-    details['Total Stakes*'] = get_value(soup, 'Total Stakes*')
-    details['No. of 1-2-3-Starts*'] = get_value(soup, 'No. of 1-2-3-Starts*')
-    details['No. of starts in past 10 race meetings'] = get_value(soup, 'No. of starts in past 10race meetings')
+    details['Import Type'] = get_value(label_map, 'Import Type')
+    details['Season Stakes*'] = get_value(label_map, 'Season Stakes*')
+    details['Total Stakes*'] = get_value(label_map, 'Total Stakes*')
+    details['No. of 1-2-3-Starts*'] = get_value(label_map, 'No. of 1-2-3-Starts*')
+    details['No. of starts in past 10 race meetings'] = get_value(label_map, 'No. of starts in past 10race meetings')
 
-    stable_location_arrival = get_value(soup, 'Current Stable Location(Arrival Date)')
+    stable_location_arrival = get_value(label_map, 'Current Stable Location(Arrival Date)')
     if stable_location_arrival:
         location_date = stable_location_arrival.split('(')
         if len(location_date) > 1:
@@ -90,14 +116,14 @@ def get_horse_details(horse_url):
         details['Current Stable Location'] = ''
         details['Arrival Date'] = ''
 
-    details['Import Date'] = get_value(soup, 'Import Date')
-    details['Trainer'] = get_trainer_id(soup)
-    details['Owner'] = get_value(soup, 'Owner')
-    details['Current Rating'] = get_value(soup, 'Current Rating')
-    details['Start of Season Rating'] = get_value(soup, 'Start ofSeason Rating')
-    details['Sire'] = get_value(soup, 'Sire')
-    details['Dam'] = get_value(soup, 'Dam')
-    details['Dam\'s Sire'] = get_value(soup, 'Dam\'s Sire')
+    details['Import Date'] = get_value(label_map, 'Import Date')
+    details['Trainer'] = get_trainer_id(label_map)
+    details['Owner'] = get_value(label_map, 'Owner')
+    details['Current Rating'] = get_value(label_map, 'Current Rating')
+    details['Start of Season Rating'] = get_value(label_map, 'Start ofSeason Rating')
+    details['Sire'] = get_value(label_map, 'Sire')
+    details['Dam'] = get_value(label_map, 'Dam')
+    details['Dam\'s Sire'] = get_value(label_map, 'Dam\'s Sire')
 
     # Extracting same sire options
     same_sire_select = soup.find('select', id='SameSire')
@@ -110,30 +136,32 @@ def get_horse_details(horse_url):
     return details
 
 # Main function to scrape all horses and save to CSV
-def main():
+def main(db_file=None, fresh=False):
     base_url = 'https://racing.hkjc.com/racing/information/english/Horse/SelectHorsebyChar.aspx?ordertype='
     index_pages = [f"{base_url}{chr(i)}" for i in range(ord('A'), ord('Z') + 1)]
 
-    all_horses = []
-    horse_count = 0
+    # Completed horse pages and their details are journalled so an interrupted crawl resumes
+    journal = CrawlJournal('horse_info', fresh=fresh)
+    horse_count = journal.count_with_rows()
     max_horses = 10000
-    fetched_urls = set()
 
     for index_page in index_pages:
+        if horse_count >= max_horses:
+            break
         horse_links = get_horse_links(index_page)
+        print(f"Current request rates: {rate_metrics()}")
         for horse_link in horse_links:
             if horse_count >= max_horses:
                 break
-            if horse_link not in fetched_urls:
+            if not journal.is_done(horse_link):
                 horse_details = get_horse_details(horse_link)
-                if horse_details:
-                    all_horses.append(horse_details)
+                if horse_details is None:  # Failed fetches and error pages stay out of the journal
+                    journal.record_failure(horse_link)
+                else:
+                    journal.record(horse_link, [horse_details])
                     horse_count += 1
-                fetched_urls.add(horse_link)
-                time.sleep(1)  # To prevent overwhelming the server
-        if horse_count >= max_horses:
-            break
 
+    all_horses = list(journal.rows())
     if all_horses:
         keys = all_horses[0].keys()
 
@@ -141,6 +169,13 @@ def main():
             dict_writer = csv.DictWriter(output_file, fieldnames=keys)
             dict_writer.writeheader()
             dict_writer.writerows(all_horses)
+        if db_file:
+            upsert_into_database(db_file, 'horses', all_horses)
+    journal.finish('horses.csv')
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Scrape HKJC horse profiles.')
+    parser.add_argument('--db', help='Also upsert the horse profiles into this racing database (see racing_db.py)')
+    parser.add_argument('--fresh', action='store_true', help='Discard the journal of an interrupted run and start the crawl over')
+    args = parser.parse_args()
+    main(args.db, args.fresh)
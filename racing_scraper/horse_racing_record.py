@@ -1,12 +1,20 @@
-import requests
-from bs4 import BeautifulSoup
 import csv
-import time
+import argparse
+from http_cache import cached_get, fetch_content, invalidate
+import common_path  # Makes scraper_common importable
+from scraper_common.parsing import make_soup
+from scraper_common.parse_pool import parse_in_pool, PARSE_WORKERS
+from crawl_journal import CrawlJournal
+from scraper_common.rate_limit import rate_metrics
+from gear_codes import encode_gear, GEAR_MASK_COLUMN
+
+# Page containers parse_race_records reads
+RECORD_CONTAINERS = [('span', 'class', 'title_text'), ('table', 'class', 'bigborder')]
 
 # Function to get the horse detail page links from an index page
 def get_horse_links(index_url):
-    response = requests.get(index_url)
-    soup = BeautifulSoup(response.content, 'html.parser')
+    response = cached_get(index_url)
+    soup = make_soup(response.content, [('table', 'class', 'bigborder')])
     horse_links = []
     tables = soup.find_all('table', class_='bigborder')
     if len(tables) > 1:
@@ -16,17 +24,38 @@ def get_horse_links(index_url):
             horse_links.append('https://racing.hkjc.com' + link['href'])
     return horse_links
 
-# Function to scrape race records from the horse detail page
+# Function to scrape race records from the horse detail page; None if the fetch failed or the page is an error page
 def get_race_records(horse_url):
     print(f"Fetching details from URL: {horse_url}")
-    response = requests.get(horse_url)
-    soup = BeautifulSoup(response.content, 'html.parser')
+    content = fetch_content(horse_url)
+    if content is None:
+        return None
+    race_records = extract_race_records(content, horse_url)
+    if race_records is None:
+        invalidate(horse_url)  # An error page served with status 200 is fetched again next time
+    return race_records
+
+# Function to parse raw horse page HTML and extract its race records; runs in the parser processes
+def extract_race_records(html, horse_url):
+    soup = make_soup(html, RECORD_CONTAINERS)
+    return parse_race_records(soup, horse_url)
+
+# Function to extract race records in a parser process, keeping the URL so the result can be journalled
+def extract_horse_page(html, horse_url):
+    return horse_url, extract_race_records(html, horse_url)
+
+# Function to extract race records from an already parsed horse detail page; None if the page has no
+# horse title (an error page rather than a horse page)
+def parse_race_records(soup, horse_url):
     race_records = []
 
     # Extract horse number and horse name
     horse_number = horse_url.split('HorseId=')[-1]
     horse_name_tag = soup.find('span', class_='title_text')
-    horse_name = horse_name_tag.text.strip().split('(')[0].strip() if horse_name_tag else ''
+    if not horse_name_tag:
+        print(f"Error: Unable to find horse name for URL: {horse_url}")
+        return None
+    horse_name = horse_name_tag.text.strip().split('(')[0].strip()
 
     table = soup.find('table', class_='bigborder', width="1000")
     if table:
@@ -69,43 +98,55 @@ def get_race_records(horse_url):
                     else:
                         race_record[f'Running Position{i + 1}'] = ''
 
-                # Handle gear field
-                gears = ["B", "BO", "CC", "CP", "CO", "E", "H", "P", "PC", "PS", "SB", "SR", "TT", "V", "VO", "XB"]
-                gear_variances = [f"{gear}{suffix}" for gear in gears for suffix in ['', '1', '2', '-']]
-
-                gear_values = columns[17].get_text(strip=True).split('/')
-                for variance in gear_variances:
-                    race_record[variance] = variance in gear_values
+                # Handle gear field: one bitmask over the gear code table instead of a column per code
+                race_record[GEAR_MASK_COLUMN] = encode_gear(columns[17].get_text(strip=True))
 
                 race_records.append(race_record)
 
     return race_records
 
+# Function to fetch every horse detail page once, yielding (raw html, url) for the parser processes;
+# pages that fail to fetch are noted in the journal and skipped
+def fetch_horse_pages(index_pages, journal):
+    fetched_urls = set()
+    for index_page in index_pages:
+        horse_links = get_horse_links(index_page)
+        print(f"Current request rates: {rate_metrics()}")
+        for horse_link in horse_links:
+            if horse_link not in fetched_urls and not journal.is_done(horse_link):
+                print(f"Fetching details from URL: {horse_link}")
+                content = fetch_content(horse_link)
+                fetched_urls.add(horse_link)
+                if content is None:
+                    journal.record_failure(horse_link)
+                    continue
+                yield content, horse_link
+
 # Main function to scrape all race records and save to CSV
-def main():
+def main(workers=PARSE_WORKERS, fresh=False):
     base_url = 'https://racing.hkjc.com/racing/information/english/Horse/SelectHorsebyChar.aspx?ordertype='
     index_pages = [f"{base_url}{chr(i)}" for i in range(ord('A'), ord('Z') + 1)]
 
-    all_race_records = []
-    horse_count = 0
+    # Completed horse pages and their records are journalled so an interrupted crawl resumes
+    journal = CrawlJournal('horse_racing_record', fresh=fresh)
+    horse_count = journal.count_with_rows()
     max_horses = 1000000
-    fetched_urls = set()
 
-    for index_page in index_pages:
-        horse_links = get_horse_links(index_page)
-        for horse_link in horse_links:
-            if horse_count >= max_horses:
-                break
-            if horse_link not in fetched_urls:
-                race_records = get_race_records(horse_link)
-                if race_records:
-                    all_race_records.extend(race_records)
-                    horse_count += 1
-                fetched_urls.add(horse_link)
-                time.sleep(1)  # To prevent overwhelming the server
+    # Network I/O stays in this process; parsing runs in a pool of worker processes
+    record_batches = parse_in_pool(fetch_horse_pages(index_pages, journal), extract_horse_page, workers)
+    for horse_link, race_records in record_batches:
         if horse_count >= max_horses:
             break
-
+        if race_records is None:  # Error pages stay out of the journal and the cache
+            invalidate(horse_link)
+            journal.record_failure(horse_link)
+            continue
+        journal.record(horse_link, race_records)
+        if race_records:
+            horse_count += 1
+    record_batches.close()
+
+    all_race_records = list(journal.rows())
     if all_race_records:
         keys = all_race_records[0].keys()
 
@@ -113,6 +154,10 @@ def main():
             dict_writer = csv.DictWriter(output_file, fieldnames=keys)
             dict_writer.writeheader()
             dict_writer.writerows(all_race_records)
+    journal.finish('race_records.csv')
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Scrape the race records of every HKJC horse.')
+    parser.add_argument('--fresh', action='store_true', help='Discard the journal of an interrupted run and start the crawl over')
+    args = parser.parse_args()
+    main(fresh=args.fresh)
@@ -0,0 +1,253 @@
+import os
+import re
+import json
+import time
+import atexit
+import hashlib
+import sqlite3
+from datetime import datetime
+from urllib.parse import unquote
+import requests
+import common_path  # Makes scraper_common importable
+from scraper_common.http_client import http_get
+
+# Location and size bound of the on-disk cache
+CACHE_DIR = os.environ.get('HTTP_CACHE_DIR', '.http_cache')
+MAX_CACHE_BYTES = int(os.environ.get('HTTP_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+
+# Set HTTP_CACHE_OFFLINE=1 to serve every cached page without revalidating it
+OFFLINE = os.environ.get('HTTP_CACHE_OFFLINE') == '1'
+
+# Cache policies, checked in order: 'immutable' pages are never refetched once stored after their meeting
+# (unless a caller that rejects the page invalidates it), 'revalidate' pages are refetched with a
+# conditional GET (ETag / Last-Modified)
+IMMUTABLE = 'immutable'
+REVALIDATE = 'revalidate'
+URL_POLICIES = [
+    (re.compile(r'LocalResults\.aspx\?.*RaceDate=', re.IGNORECASE), IMMUTABLE),
+    (re.compile(r'LocalResults\.aspx$', re.IGNORECASE), REVALIDATE),
+    (re.compile(r'Horse\.aspx\?.*HorseId=', re.IGNORECASE), REVALIDATE),
+    (re.compile(r'SelectHorsebyChar\.aspx', re.IGNORECASE), REVALIDATE),
+]
+
+# Last-access updates of cache hits are written in batches of this size instead of one commit per hit
+TOUCH_BATCH = 500
+
+_connection = None
+_pending_touches = {}
+_total_bytes = None
+
+# Function to open (and create if needed) the cache index
+def get_connection():
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.join(CACHE_DIR, 'objects'), exist_ok=True)
+        _connection = sqlite3.connect(os.path.join(CACHE_DIR, 'index.sqlite'))
+        _connection.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )""")
+        _connection.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        _connection.execute("CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest)")
+        _connection.commit()
+    return _connection
+
+# Function to find the cache policy for a URL stored at stored_at (a timestamp, None if not stored yet).
+# A race page only becomes immutable once it was stored on a day after its meeting: a copy fetched on
+# race day may hold partial or unpublished results and is revalidated until it is stored again later.
+def get_policy(url, stored_at=None):
+    for pattern, policy in URL_POLICIES:
+        if pattern.search(url):
+            if policy == IMMUTABLE and not stored_after_race_date(url, stored_at):
+                return REVALIDATE
+            return policy
+    return REVALIDATE
+
+# Function to get the meeting date of a race page URL, or None if it has no readable RaceDate
+def race_date_of(url):
+    match = re.search(r'RaceDate=([^&]+)', unquote(url))
+    if not match:
+        return None
+    for date_format in ('%d/%m/%Y', '%Y/%m/%d'):
+        try:
+            return datetime.strptime(match.group(1), date_format).date()
+        except ValueError:
+            continue
+    return None
+
+# Function to check whether a race page was stored on a day after its meeting
+def stored_after_race_date(url, stored_at):
+    race_date = race_date_of(url)
+    if race_date is None or stored_at is None:
+        return False
+    return datetime.fromtimestamp(stored_at).date() > race_date
+
+# Function to get the path of a stored body from its content digest
+def object_path(digest):
+    return os.path.join(CACHE_DIR, 'objects', digest[:2], digest)
+
+# Function to build a requests.Response from a cache entry so callers can use it unchanged
+def build_response(url, status, headers, body):
+    response = requests.Response()
+    response.url = url
+    response.status_code = status
+    response.headers.update(json.loads(headers))
+    response._content = body
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    return response
+
+# Function to read a cache entry, returning None if it is missing or its body was evicted
+def load_entry(url):
+    row = get_connection().execute(
+        "SELECT digest, status, headers, etag, last_modified, stored_at FROM entries WHERE url = ?", (url,)).fetchone()
+    if not row:
+        return None
+    digest, status, headers, etag, last_modified, stored_at = row
+    try:
+        with open(object_path(digest), 'rb') as f:
+            body = f.read()
+    except FileNotFoundError:
+        return None
+    return {'status': status, 'headers': headers, 'etag': etag, 'last_modified': last_modified, 'stored_at': stored_at, 'body': body}
+
+# Function to get the size of the stored bodies, counting each digest once (bodies are shared between URLs
+# with identical content); summed from the index once per process and kept up to date from then on
+def cache_bytes():
+    global _total_bytes
+    if _total_bytes is None:
+        _total_bytes = get_connection().execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM entries)").fetchone()[0]
+    return _total_bytes
+
+# Function to delete a stored body once no entry refers to it any more
+def release_body(connection, digest, size):
+    global _total_bytes
+    if connection.execute("SELECT 1 FROM entries WHERE digest = ?", (digest,)).fetchone():
+        return
+    try:
+        os.remove(object_path(digest))
+    except FileNotFoundError:
+        pass
+    _total_bytes = cache_bytes() - size
+
+# Function to store a response body under its content digest and index it by URL
+def store_entry(url, response):
+    global _total_bytes
+    body = response.content
+    digest = hashlib.sha256(body).hexdigest()
+    path = object_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(body)
+        os.replace(path + '.tmp', path)
+
+    now = time.time()
+    _pending_touches.pop(url, None)
+    connection = get_connection()
+    cache_bytes()  # Sum the index before this entry changes it
+    previous = connection.execute("SELECT digest, size FROM entries WHERE url = ?", (url,)).fetchone()
+    new_body = not connection.execute("SELECT 1 FROM entries WHERE digest = ?", (digest,)).fetchone()
+    connection.execute(
+        "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (url, digest, len(body), response.status_code, json.dumps(dict(response.headers)),
+         response.headers.get('ETag'), response.headers.get('Last-Modified'), now, now))
+    if new_body:
+        _total_bytes += len(body)
+    if previous and previous[0] != digest:
+        release_body(connection, *previous)
+    connection.commit()
+    evict()
+
+# Function to drop the cache entry of a URL whose page the caller rejected (e.g. an error page served with
+# status 200), so the page is fetched again next time instead of being served from the cache for good
+def invalidate(url):
+    _pending_touches.pop(url, None)
+    connection = get_connection()
+    cache_bytes()
+    row = connection.execute("SELECT digest, size FROM entries WHERE url = ?", (url,)).fetchone()
+    if row:
+        connection.execute("DELETE FROM entries WHERE url = ?", (url,))
+        release_body(connection, *row)
+        connection.commit()
+
+# Function to mark a cache entry as stored now, after a conditional GET confirmed it is still current
+def restore_entry(url):
+    now = time.time()
+    _pending_touches.pop(url, None)
+    connection = get_connection()
+    connection.execute("UPDATE entries SET stored_at = ?, last_access = ? WHERE url = ?", (now, now, url))
+    connection.commit()
+
+# Function to mark a cache entry as recently used; updates are kept in memory and written TOUCH_BATCH at a time
+def touch_entry(url):
+    _pending_touches[url] = time.time()
+    if len(_pending_touches) >= TOUCH_BATCH:
+        flush_touches()
+
+# Function to write the pending last-access updates in one transaction
+def flush_touches():
+    if not _pending_touches:
+        return
+    connection = get_connection()
+    connection.executemany("UPDATE entries SET last_access = ? WHERE url = ?",
+                           [(last_access, url) for url, last_access in _pending_touches.items()])
+    connection.commit()
+    _pending_touches.clear()
+
+atexit.register(flush_touches)
+
+# Function to evict least recently used entries until the cache fits in MAX_CACHE_BYTES
+def evict(max_bytes=None):
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    if cache_bytes() <= max_bytes:
+        return
+    flush_touches()  # Evict by up-to-date access times
+    connection = get_connection()
+    for url, digest, size in connection.execute(
+            "SELECT url, digest, size FROM entries ORDER BY last_access").fetchall():
+        connection.execute("DELETE FROM entries WHERE url = ?", (url,))
+        release_body(connection, digest, size)
+        if cache_bytes() <= max_bytes:
+            break
+    connection.commit()
+
+# Function to GET a page through the disk cache and return its body, or None if the fetch failed
+def fetch_content(url):
+    try:
+        response = cached_get(url)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"Failed to retrieve data from {url}: {e}")
+        return None
+    return response.content
+
+# Function to GET a URL through the disk cache; drop-in replacement for requests.get(url)
+def cached_get(url, **kwargs):
+    entry = load_entry(url)
+    if entry and (OFFLINE or get_policy(url, entry['stored_at']) == IMMUTABLE):
+        touch_entry(url)
+        return build_response(url, entry['status'], entry['headers'], entry['body'])
+
+    headers = dict(kwargs.pop('headers', None) or {})
+    if entry:
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    response = http_get(url, headers=headers, **kwargs)  # Only real network requests are rate limited
+    if entry and response.status_code == 304:
+        restore_entry(url)
+        return build_response(url, entry['status'], entry['headers'], entry['body'])
+    if response.status_code == 200:
+        store_entry(url, response)
+    return response
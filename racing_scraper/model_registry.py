@@ -0,0 +1,70 @@
+import os
+import glob
+import json
+import hashlib
+import joblib
+import pandas as pd
+import sklearn
+
+# Folder fitted models are saved in
+MODEL_DIR = os.environ.get('MODEL_DIR', 'models')
+
+# Function to fingerprint the training rows of a model together with its settings; any change to the rows,
+# the columns, the settings or the scikit-learn version gives a different key
+def training_key(data, settings):
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    digest.update(json.dumps([[str(column) for column in data.columns], settings, sklearn.__version__], sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+# Class to train one model per distance at most once: fitted models are kept in memory and saved to
+# MODEL_DIR under their training key, so later runs load them instead of retraining until the data changes
+class ModelRegistry:
+    def __init__(self, train, settings, model_dir=MODEL_DIR, distance_settings=None):
+        self.train = train  # train(data, distance) -> fitted model
+        self.settings = settings
+        self.distance_settings = distance_settings  # distance_settings(distance) -> settings of that distance only
+        self.model_dir = model_dir
+        self.models = {}
+        self.keys = {}
+
+    def model_path(self, distance, key):
+        return os.path.join(self.model_dir, f"distance-{distance:g}-{key}.joblib")
+
+    # Function to get the model for a distance, training it only if no model exists for the current data
+    def get(self, data, distance):
+        distance = float(distance)
+        key = self.key_for(data, distance)
+        if (distance, key) in self.models:
+            return self.models[(distance, key)]
+
+        path = self.model_path(distance, key)
+        if os.path.exists(path):
+            print(f"Loading model for distance {distance:g} from {path}")
+            model = joblib.load(path)
+        else:
+            model = self.train(data, distance)
+            self.save(model, distance, key)
+        self.models[(distance, key)] = model
+        return model
+
+    # Function to get the training key of a distance; the hash is reused while the same data frame is passed in
+    def key_for(self, data, distance):
+        cached = self.keys.get(distance)
+        if cached and cached[0] is data:
+            return cached[1]
+        settings = {**self.settings, **self.distance_settings(distance)} if self.distance_settings else self.settings
+        key = training_key(data[data['Distance'] == distance], settings)
+        self.keys[distance] = (data, key)
+        return key
+
+    # Function to save a model atomically and remove the models it replaces
+    def save(self, model, distance, key):
+        os.makedirs(self.model_dir, exist_ok=True)
+        path = self.model_path(distance, key)
+        joblib.dump(model, path + '.tmp')
+        os.replace(path + '.tmp', path)
+        for old_path in glob.glob(self.model_path(distance, '*')):
+            if old_path != path:
+                os.remove(old_path)
+        print(f"Saved model for distance {distance:g} to {path}")
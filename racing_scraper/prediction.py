@@ -1,75 +1,93 @@
 import pandas as pd
-from sklearn.model_selection import train_test_split, GridSearchCV
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.impute import SimpleImputer
+from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import numpy as np
-
-# Function to convert time string to total seconds (e.g., '1.11.47' -> 1*60 + 11.47 seconds)
-def time_to_seconds(time_str):
-    try:
-        if '.' in time_str:
-            parts = time_str.split('.')
-            if len(parts) == 3:
-                minutes = int(parts[0])
-                seconds = int(parts[1])
-                milliseconds = int(parts[2])
-                return minutes * 60 + seconds + milliseconds / 100
-        return np.nan
-    except ValueError:
-        return np.nan
-
-# Load the new data
-data = pd.read_csv('race_records_20240616.csv')
-
-# Debug: Print the first few rows of the dataset
-print("Initial data:")
-print(data.head())
-
-# Check for unique values in the 'Finish Time' column
-print("Unique values in 'Finish Time' before conversion:")
-print(data['Finish Time'].unique())
-
-# Convert 'Finish Time' to seconds
-data['Finish Time'] = data['Finish Time'].apply(time_to_seconds)
-
-# Convert 'Distance' to numeric
-data['Distance'] = pd.to_numeric(data['Distance'], errors='coerce')
-
-# Debug: Print the first few rows of the dataset after conversion
-print("Data after converting 'Finish Time' to seconds:")
-print(data.head())
+from gear_codes import encode_gear, GEAR_CODES, GEAR_MASK_COLUMN
+from race_prep import prepare_records, prepare_features, NUMERICAL_FEATURES, CATEGORICAL_FEATURES
+from racing_store import has_table, read_table
+from race_loader import read_race_csv
+from race_models import fit_forest_model, fit_boosting_model, FOREST_PARAM_GRID, ENGINES
+from model_registry import ModelRegistry
+
+# Race records CSV, used when the Parquet store (racing_store.py) has no records table yet
+RECORDS_CSV = 'race_records_20240616.csv'
+
+# Columns the model reads from the race records
+RECORD_COLUMNS = ['Horse Number', 'Horse Name', 'Racecourse', 'Track', 'Course', 'Distance', 'Going', 'Race Class',
+                  'Draw', 'Rating', 'Trainer', 'Jockey', 'Win Odds', 'Actual Weight', 'Declared Horse Weight',
+                  'Finish Time', GEAR_MASK_COLUMN, 'Date']
+
+# Function to load race records for the given distances, reading only the model's columns with their
+# typed schema; from the Parquet store only the row groups holding those distances are read
+def load_race_records(distances=None):
+    if has_table('records'):
+        filters = [('Distance', 'in', [int(d) for d in distances])] if distances else None
+        return read_table('records', columns=RECORD_COLUMNS, filters=filters)
+    data = read_race_csv('records', RECORDS_CSV, usecols=RECORD_COLUMNS)
+    if distances:
+        data = data[data['Distance'].isin([int(d) for d in distances])].reset_index(drop=True)
+    return data
+
+# Prepared training records of every distance loaded so far
+training_records = {}
+
+# Function to get the prepared training records of the given distances; only the distances a prediction
+# needs are loaded, each the first time it is needed
+def records_for_distances(distances):
+    missing = sorted({float(distance) for distance in distances} - training_records.keys())
+    if missing:
+        data = load_race_records(missing)
+
+        # Debug: Print the first few rows of the dataset
+        print(f"Initial data for distances {', '.join(f'{distance:g}' for distance in missing)}:")
+        print(data.head())
+
+        # Check for finish times the loader could not read as seconds (e.g. '---' for horses that did not finish)
+        print(f"Rows without a finish time in seconds: {data['Finish Time'].isna().sum()}")
+
+        # Type the features and drop rows without a finish time, in one vectorized pass
+        data = prepare_records(data)
+
+        # Debug: Print the first few rows of the dataset after preparation
+        print("Data after preparing features:")
+        print(data.head())
+
+        # Debug: Print the number of rows after dropping NaNs in 'Finish Time'
+        print(f"Number of rows after dropping NaNs in 'Finish Time': {len(data)}")
+
+        for distance in missing:
+            training_records[distance] = data[data['Distance'] == distance]
+    return {float(distance): training_records[float(distance)] for distance in distances}
 
 # Clean the data
 # Identify numerical columns
-numerical_features = ['Draw', 'Rating', 'Win Odds', 'Actual Weight', 'Declared Horse Weight']
-extra_numerical_features = [col for col in data.columns if col.startswith(('B', 'BO', 'CC', 'CP', 'CO', 'E', 'H', 'P', 'PC', 'PS', 'SB', 'SR', 'TT', 'V', 'VO', 'XB'))]
-# Exclude 'Horse Number' and 'Horse Name' explicitly
-extra_numerical_features = [col for col in extra_numerical_features if col not in ['Horse Number', 'Horse Name']]
+numerical_features = NUMERICAL_FEATURES
+# Gear flags come from the code table, expanded from the gear mask into one 0/1 column per code
+extra_numerical_features = GEAR_CODES
 all_numerical_features = numerical_features + extra_numerical_features
 
-# Convert only numerical columns to numeric and coerce errors to NaN
-data[all_numerical_features] = data[all_numerical_features].apply(pd.to_numeric, errors='coerce')
-
-# Fill NaN values with 0 for boolean features before converting to int
-for col in extra_numerical_features:
-    data[col] = data[col].fillna(0).astype(int)
+# Convert categorical features to numerical values
+categorical_features = CATEGORICAL_FEATURES
 
-# Debug: Print the first few rows of the dataset after filling NaNs
-print("Data after filling NaNs in extra numerical features:")
-print(data.head())
+# Encoder of the horse id, trainer and jockey (see race_encoders.ENCODERS; benchmark_encoders.py compares them)
+HIGH_CARDINALITY_ENCODER = 'target'
 
-# Drop rows with NaN values in 'Finish Time'
-data.dropna(subset=['Finish Time'], inplace=True)
+# Hyperparameter grid searched for the forest of every distance, and how it is searched (see race_models.TUNING_MODES)
+PARAM_GRID = FOREST_PARAM_GRID
+TUNING = 'halving'
 
-# Debug: Print the number of rows after dropping NaNs in 'Finish Time'
-print(f"Number of rows after dropping NaNs in 'Finish Time': {len(data)}")
+# Model engine of each distance (see race_models.ENGINES; benchmark_engines.py compares them):
+# 'forest' is the grid-searched random forest, 'boosting' gradient boosting with native categoricals
+# and early stopping on the most recent races. Distances not listed use DEFAULT_ENGINE.
+DEFAULT_ENGINE = 'forest'
+DISTANCE_ENGINES = {}
 
-# Convert categorical features to numerical values
-categorical_features = ['Horse Number', 'Horse Name', 'Racecourse', 'Track', 'Course', 'Distance', 'Going', 'Race Class', 'Trainer', 'Jockey']
+# Function to get the model engine of a distance
+def engine_for_distance(distance):
+    engine = DISTANCE_ENGINES.get(float(distance), DEFAULT_ENGINE)
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r} for distance {distance}, expected one of {', '.join(ENGINES)}")
+    return engine
 
 # Function to train model based on specific distance
 def train_model_for_distance(data, distance):
@@ -85,39 +103,16 @@ def train_model_for_distance(data, distance):
     # Define features and target variable
     X = filtered_data[categorical_features + all_numerical_features]
     y = filtered_data['Finish Time']
+    dates = filtered_data['Date'] if 'Date' in filtered_data else None
 
     # Split the data into training and testing sets
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-    # Column transformer for preprocessing
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('num', Pipeline(steps=[
-                ('imputer', SimpleImputer(strategy='mean')),
-                ('scaler', StandardScaler())
-            ]), all_numerical_features),
-            ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_features)
-        ])
-
-    # Define the model pipeline
-    model = Pipeline(steps=[
-        ('preprocessor', preprocessor),
-        ('regressor', RandomForestRegressor(random_state=42))
-    ])
-
-    # Hyperparameter tuning
-    param_grid = {
-        'regressor__n_estimators': [100, 200],
-        'regressor__max_depth': [None, 10, 20],
-        'regressor__min_samples_split': [2, 5],
-        'regressor__min_samples_leaf': [1, 2]
-    }
-    
-    grid_search = GridSearchCV(model, param_grid, cv=3, scoring='neg_mean_squared_error', n_jobs=-1)
-    grid_search.fit(X_train, y_train)
-    
-    # Best model
-    best_model = grid_search.best_estimator_
+    # Fit the distance's engine: a grid-searched forest, or boosting stopped early on the latest races
+    if engine_for_distance(distance) == 'boosting':
+        best_model = fit_boosting_model(X_train, y_train, all_numerical_features, dates=None if dates is None else dates.loc[X_train.index])
+    else:
+        best_model = fit_forest_model(X_train, y_train, all_numerical_features, HIGH_CARDINALITY_ENCODER, param_grid=PARAM_GRID, cv=3, tuning=TUNING)
 
     # Make predictions
     y_pred = best_model.predict(X_test)
@@ -138,75 +133,89 @@ def train_model_for_distance(data, distance):
 
     return best_model
 
+# Trained models are cached per distance and only retrained when the training data or settings change
+model_registry = ModelRegistry(train_model_for_distance, {
+    'categorical_features': categorical_features,
+    'numerical_features': all_numerical_features,
+    'high_cardinality_encoder': HIGH_CARDINALITY_ENCODER,
+    'param_grid': PARAM_GRID,
+    'tuning': TUNING,
+    'test_size': 0.2,
+    'cv': 3,
+    'random_state': 42,
+}, distance_settings=lambda distance: {'engine': engine_for_distance(distance)})
+
+# Columns that identify a race on a race card; runners are ranked against the others in their race
+RACE_KEY = ['Date', 'Race Index']
+
+# Function to predict finish times for a whole race card (or meeting) at once. runners is a DataFrame or an
+# iterable of dicts with the model's columns, gear given as a gear mask or per-code flags. Each distance's
+# model is run once over all its runners. race_key names the columns that identify a race; every one of
+# them must be present, and None ranks all runners as one race. Returns the runners, with the index they
+# came with, plus 'Predicted Finish Time' and 'Predicted Placing' (1 = fastest in its race).
+def predict_race_card(runners, race_key=RACE_KEY):
+    runners = pd.DataFrame(runners)
+    missing = [column for column in race_key or [] if column not in runners]
+    if missing:
+        raise ValueError(f"Race card has no {', '.join(missing)} column to identify its races; pass race_key=None to rank all runners as one race")
+    card = prepare_features(runners.reset_index(drop=True))
+
+    card['Predicted Finish Time'] = np.nan
+    records = records_for_distances(card['Distance'].dropna().unique())
+    for distance, runners_at_distance in card.groupby('Distance'):
+        best_model = model_registry.get(records[float(distance)], distance)
+        card.loc[runners_at_distance.index, 'Predicted Finish Time'] = best_model.predict(runners_at_distance[categorical_features + all_numerical_features])
+
+    predicted_times = card['Predicted Finish Time']
+    ranks = predicted_times.groupby([card[column] for column in race_key]).rank(method='min') if race_key else predicted_times.rank(method='min')
+    card['Predicted Placing'] = ranks.astype('Int64')
+    card.index = runners.index
+    return card
+
 # Function to predict finish time for new data
 def predict_finish_time(horse_number, horse_name, racecourse, track, course, distance, going, race_class, draw, rating, trainer, jockey, win_odds, actual_weight, declared_horse_weight, **kwargs):
-    # Train the model for the specific distance
-    best_model = train_model_for_distance(data, distance)
-    
-    new_data = pd.DataFrame({
-        'Horse Number': [horse_number],
-        'Horse Name': [horse_name],
-        'Racecourse': [racecourse],
-        'Track': [track],
-        'Course': [course],
-        'Distance': [distance],
-        'Going': [going],
-        'Race Class': [race_class],
-        'Draw': [draw],
-        'Rating': [rating],
-        'Trainer': [trainer],
-        'Jockey': [jockey],
-        'Win Odds': [win_odds],
-        'Actual Weight': [actual_weight],
-        'Declared Horse Weight': [declared_horse_weight],
+    runner = {
+        'Horse Number': horse_number,
+        'Horse Name': horse_name,
+        'Racecourse': racecourse,
+        'Track': track,
+        'Course': course,
+        'Distance': distance,
+        'Going': going,
+        'Race Class': race_class,
+        'Draw': draw,
+        'Rating': rating,
+        'Trainer': trainer,
+        'Jockey': jockey,
+        'Win Odds': win_odds,
+        'Actual Weight': actual_weight,
+        'Declared Horse Weight': declared_horse_weight,
         **kwargs
-    })
-    
-    # Add missing columns with default values
-    for col in extra_numerical_features:
-        if col not in new_data:
-            new_data[col] = 0
-    
-    # Convert boolean features to integers (1 for True, 0 for False)
-    for col in extra_numerical_features:
-        new_data[col] = new_data[col].astype(int)
-    
-    # Apply the same preprocessing steps to the new data
-    new_data_preprocessed = best_model.named_steps['preprocessor'].transform(new_data)
-    
-    # Make prediction
-    finish_time_pred = best_model.named_steps['regressor'].predict(new_data_preprocessed)
-    
-    return finish_time_pred[0]
-
-# Example usage of the prediction function
-horse_number = 'HK_2022_H311'
-horse_name = 'GLORY ELITE'
-racecourse = 'ST'
-track = 'Turf'
-course = 'C+3'
-distance = 1200
-going = 'S'
-race_class = '4'
-draw = 2
-rating = 60
-trainer = 'TKH'
-jockey = 'LDE'
-win_odds = 1.6
-actual_weight = 135
-declared_horse_weight = 1189
-extra_features = {
-    'B': False, 'B1': False, 'B2': False, 'B-': False, 'BO': False, 'BO1': False, 'BO2': False, 'BO-': False, 'CC': False, 'CC1': False, 'CC2': False, 'CC-': False,
-    'CP': False, 'CP1': False, 'CP2': False, 'CP-': False, 'CO': False, 'CO1': False, 'CO2': False, 'CO-': False, 'E': False, 'E1': False, 'E2': False, 'E-': False,
-    'H': True, 'H1': False, 'H2': False, 'H-': False, 'P': False, 'P1': False, 'P2': False, 'P-': False, 'PC': False, 'PC1': False, 'PC2': False, 'PC-': False,
-    'PS': False, 'PS1': False, 'PS2': False, 'PS-': False, 'SB': False, 'SB1': False, 'SB2': False, 'SB-': False, 'SR': False, 'SR1': False, 'SR2': False, 'SR-': False,
-    'TT': False, 'TT1': False, 'TT2': False, 'TT-': False, 'V': False, 'V1': False, 'V2': False, 'V-': False, 'VO': False, 'VO1': False, 'VO2': False, 'VO-': False,
-    'XB': False, 'XB1': False, 'XB2': False, 'XB-': False
-}
-
-# Convert boolean extra_features to int
-extra_features = {k: int(v) for k, v in extra_features.items()}
-
-# Combine extra features with new data
-predicted_time = predict_finish_time(horse_number, horse_name, racecourse, track, course, distance, going, race_class, draw, rating, trainer, jockey, win_odds, actual_weight, declared_horse_weight, **extra_features)
-print(f'Predicted Finish Time: {predicted_time} seconds')
+    }
+    return predict_race_card([runner], race_key=None)['Predicted Finish Time'].iloc[0]
+
+# Main function with an example prediction for one runner
+def main():
+    horse_number = 'HK_2022_H311'
+    horse_name = 'GLORY ELITE'
+    racecourse = 'ST'
+    track = 'Turf'
+    course = 'C+3'
+    distance = 1200
+    going = 'S'
+    race_class = '4'
+    draw = 2
+    rating = 60
+    trainer = 'TKH'
+    jockey = 'LDE'
+    win_odds = 1.6
+    actual_weight = 135
+    declared_horse_weight = 1189
+    extra_features = {GEAR_MASK_COLUMN: encode_gear('H')}
+
+    # Combine extra features with new data
+    predicted_time = predict_finish_time(horse_number, horse_name, racecourse, track, course, distance, going, race_class, draw, rating, trainer, jockey, win_odds, actual_weight, declared_horse_weight, **extra_features)
+    print(f'Predicted Finish Time: {predicted_time} seconds')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.compose import ColumnTransformer
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder, OrdinalEncoder, TargetEncoder
+from race_prep import LOW_CARDINALITY_FEATURES, HIGH_CARDINALITY_FEATURES
+
+# Columns high-cardinality values are hashed into, shared by all hashed features
+HASH_WIDTH = 256
+
+# Class to encode each category by the share of training rows it appears in; unseen categories get 0
+class FrequencyEncoder(TransformerMixin, BaseEstimator):
+    def fit(self, X, y=None):
+        X = pd.DataFrame(X)
+        self.frequencies_ = [X.iloc[:, i].value_counts(normalize=True) for i in range(X.shape[1])]
+        self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    def transform(self, X):
+        X = pd.DataFrame(X)
+        return np.column_stack([X.iloc[:, i].map(frequencies).fillna(0).to_numpy(dtype=float) for i, frequencies in enumerate(self.frequencies_)])
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray([f"{column}_frequency" for column in self.feature_names_in_], dtype=object)
+
+# Class to hash 'column=value' tokens into a fixed number of sparse columns, so the width never grows with
+# the number of horses, trainers or jockeys; needs no fitting and handles unseen categories
+class HashingEncoder(TransformerMixin, BaseEstimator):
+    def __init__(self, n_features=HASH_WIDTH):
+        self.n_features = n_features
+
+    def fit(self, X, y=None):
+        X = pd.DataFrame(X)
+        self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    def transform(self, X):
+        X = pd.DataFrame(X)
+        tokens = [(f"{column}=" + X.iloc[:, i].astype(str)).tolist() for i, column in enumerate(self.feature_names_in_)]
+        hasher = FeatureHasher(n_features=self.n_features, input_type='string', alternate_sign=False)
+        return hasher.transform(zip(*tokens))
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray([f"hash_{i}" for i in range(self.n_features)], dtype=object)
+
+# Encoders selectable for the high-cardinality features (horse id, trainer, jockey):
+#   onehot    - one sparse column per category, as the model has always used
+#   target    - mean finish time of the category, computed out-of-fold while fitting so a row never sees its own target
+#   frequency - share of training rows with the category
+#   hashing   - HASH_WIDTH sparse columns of hashed categories
+#   native    - one integer code per category (unseen: -1), which trees split on directly
+ENCODERS = {
+    'onehot': lambda: OneHotEncoder(handle_unknown='ignore'),
+    'target': lambda: TargetEncoder(target_type='continuous'),
+    'frequency': FrequencyEncoder,
+    'hashing': HashingEncoder,
+    'native': lambda: OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1, encoded_missing_value=-1),
+}
+
+# Function to build the preprocessing of the model features: numbers imputed and scaled, low-cardinality
+# categories one-hot encoded, and the high-cardinality ones encoded with the chosen encoder
+def make_preprocessor(numerical_features, encoder='onehot'):
+    if encoder not in ENCODERS:
+        raise ValueError(f"Unknown encoder {encoder!r}, expected one of {', '.join(ENCODERS)}")
+    return ColumnTransformer(
+        transformers=[
+            ('num', Pipeline(steps=[
+                ('imputer', SimpleImputer(strategy='mean')),
+                ('scaler', StandardScaler())
+            ]), numerical_features),
+            ('cat', OneHotEncoder(handle_unknown='ignore'), LOW_CARDINALITY_FEATURES),
+            ('ids', ENCODERS[encoder](), HIGH_CARDINALITY_FEATURES)
+        ])
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+from race_types import TABLES, SCHEMAS, to_typed
+from gear_codes import GEAR_CODES
+
+# Rows parsed at a time; only one chunk is ever held as raw text
+CHUNK_ROWS = 10000
+
+# Function to get the read_csv dtypes of a table: categorical columns are built as categories while parsing,
+# the gear mask as uint64, and everything else as text that to_typed coerces (so '---' and blanks become NA).
+# The per-code gear columns of older record files only hold 'True'/'False', so they are read as categories too.
+def csv_dtypes(name):
+    dtypes = {}
+    if name == 'records':
+        dtypes.update({code: 'category' for code in GEAR_CODES})
+    for column, dtype in SCHEMAS[name].items():
+        dtypes[column] = dtype if dtype in ('category', 'uint64') else str
+    return dtypes
+
+# Function to read a scraped CSV chunk by chunk, yielding typed frames (see race_types.SCHEMAS).
+# usecols limits the columns read; for race records, per-code gear columns of older files are
+# read as well when the gear mask is requested, and folded into it.
+def iter_race_csv(name, path=None, usecols=None, chunksize=CHUNK_ROWS):
+    path = path or TABLES[name]['csv']
+    columns = None
+    if usecols is not None:
+        wanted = set(usecols)
+        columns = lambda column: column in wanted or (name == 'records' and 'Gear Mask' in wanted and column in GEAR_CODES)
+    reader = pd.read_csv(path, usecols=columns, dtype=csv_dtypes(name), keep_default_na=False, na_values=[''], chunksize=chunksize)
+    for chunk in reader:
+        yield to_typed(name, chunk)
+
+# Function to count the line breaks of a file, an upper bound on its rows (quoted line breaks only add to it)
+def count_lines(path):
+    lines = 1  # For a last row without a trailing line break
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            lines += block.count(b'\n')
+    return lines
+
+# Function to allocate an empty column of rows values with the dtype of a typed chunk's column, or None for
+# types that cannot be filled in place (arrow-backed text), which are concatenated at the end instead
+def allocate_column(values, rows):
+    if isinstance(values.dtype, np.dtype):
+        return np.empty(rows, dtype=values.dtype)
+    if isinstance(values.array, pd.arrays.IntegerArray):
+        return pd.arrays.IntegerArray(np.zeros(rows, dtype=values.dtype.numpy_dtype), np.ones(rows, dtype=bool))
+    return None
+
+# Function to combine typed chunks into one frame of at most rows rows. Columns are allocated once and
+# every chunk is copied into place as it is read, so the frame is never held twice as it would be by a
+# final concatenation; categorical columns keep one array of codes and grow their categories as new
+# values appear (in order of appearance, as union_categoricals would).
+def combine_chunks(chunks, rows):
+    columns, categories, pieces = None, {}, {}
+    start = 0
+    for chunk in chunks:
+        if columns is None:
+            columns = {}
+            for column in chunk:
+                if isinstance(chunk[column].dtype, pd.CategoricalDtype):
+                    columns[column] = np.empty(rows, dtype=np.int32)
+                    categories[column] = chunk[column].cat.categories[:0]
+                else:
+                    columns[column] = allocate_column(chunk[column], rows)
+                    if columns[column] is None:
+                        pieces[column] = []
+        stop = start + len(chunk)
+        for column, values in chunk.items():
+            if column in categories:
+                chunk_categories = values.cat.categories
+                categories[column] = categories[column].append(chunk_categories[~chunk_categories.isin(categories[column])])
+                positions = np.append(categories[column].get_indexer(chunk_categories), -1)
+                columns[column][start:stop] = positions[values.cat.codes.to_numpy()]  # Code -1 (missing) picks the trailing -1
+            elif column in pieces:
+                pieces[column].append(values)
+            else:
+                columns[column][start:stop] = values.array if isinstance(columns[column], pd.arrays.IntegerArray) else values.to_numpy()
+        start = stop
+    if columns is None:
+        return pd.DataFrame()
+
+    data = {}
+    for column, values in columns.items():
+        if column in categories:
+            data[column] = pd.Categorical.from_codes(values[:start], categories[column])
+        elif column in pieces:
+            data[column] = pd.concat(pieces.pop(column), ignore_index=True).array
+        else:
+            data[column] = values[:start]
+    return pd.DataFrame(data, copy=False)
+
+# Function to read a whole scraped CSV into a typed, memory-lean frame. The frame is always several times
+# smaller than pd.read_csv's, but the loader's peak memory only falls below read_csv's on large files: the
+# typing code costs a fixed ~13 MB, so on a few-MB file such as race_results_full.csv (19k rows) the peak
+# is higher (about 27 MB against 19 MB), while on a 385k-row file it is about 58 MB against 200 MB
+def read_race_csv(name, path=None, usecols=None, chunksize=CHUNK_ROWS):
+    path = path or TABLES[name]['csv']
+    return combine_chunks(iter_race_csv(name, path, usecols, chunksize), count_lines(path))
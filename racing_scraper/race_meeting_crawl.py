@@ -0,0 +1,84 @@
+import argparse
+import pandas as pd
+from race_pages import get_race_dates, get_race_urls, get_race_soup, race_key
+from racing_result import parse_race_data, RESULT_COLUMNS, RESULT_CONTAINERS
+from racing_field import parse_field_info, FIELD_COLUMNS, FIELD_CONTAINERS
+from crawl_journal import CrawlJournal
+from http_cache import invalidate
+from racing_db import upsert_into_database
+
+# Function to fetch one race page and extract both its results and its field information;
+# None if the fetch failed or the page lacks either table
+def crawl_race(url, date, race_no):
+    soup = get_race_soup(url, RESULT_CONTAINERS + FIELD_CONTAINERS)
+    if soup is None:
+        return None
+    race_rows = parse_race_data(soup, url, date, race_no)
+    field_rows = parse_field_info(soup, url, date, race_no)
+    if race_rows is None or field_rows is None:
+        invalidate(url)  # An error page served with status 200 is fetched again next time
+        return None
+    key = race_key(date, race_no)
+    return [[key] + row for row in race_rows], [[key] + row for row in field_rows]
+
+# Main function to crawl every race meeting once and save results and field information together
+def main(db_file=None, fresh=False):
+    race_dates = get_race_dates()
+    url_count = 0
+
+    # Completed race pages are journalled with their rows, tagged 'results' or 'field', so an interrupted crawl resumes
+    journal = CrawlJournal('race_meeting_crawl', fresh=fresh)
+
+    for date in race_dates:
+        race_urls = get_race_urls(date)
+        for i, url in enumerate(race_urls):
+            if url_count >= 20000:  # Limit to the first 20000 URLs
+                break
+            race_no = i + 1  # Race number starts from 1
+            url_count += 1
+            if journal.is_done(url):
+                continue
+            print(f"Scraping {url}...")
+            race = crawl_race(url, date, race_no)
+            if race is None:  # Failed fetches and error pages stay out of the journal
+                journal.record_failure(url)
+            else:
+                race_data, field_data = race
+                journal.record(url, [['results', row] for row in race_data] + [['field', row] for row in field_data])
+        if url_count >= 20000:
+            break
+
+    all_race_data = []
+    all_field_data = []
+    for table, row in journal.rows():
+        (all_race_data if table == 'results' else all_field_data).append(row)
+
+    if not all_race_data and not all_field_data:
+        print("No race data found.")
+        journal.finish('race_results.csv')
+        return
+
+    results = pd.DataFrame(all_race_data, columns=["race key"] + RESULT_COLUMNS)
+    results.to_csv('race_results.csv', index=False)
+    print("Data saved to race_results.csv")
+
+    fields = pd.DataFrame(all_field_data, columns=["race key"] + FIELD_COLUMNS)
+    fields.to_csv('field_information.csv', index=False)
+    print("Data saved to field_information.csv")
+
+    # Every runner joined with the conditions of its race, keyed on the shared race key
+    joined = results.merge(fields.drop(columns=["Race date", "Race number"]), on="race key", how="left")
+    joined.to_csv('race_results_with_field.csv', index=False)
+    print("Data saved to race_results_with_field.csv")
+
+    if db_file:
+        upsert_into_database(db_file, 'results', results.drop(columns=["race key"]))
+        upsert_into_database(db_file, 'field', fields.drop(columns=["race key"]))
+    journal.finish('race_results.csv and field_information.csv')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Crawl HKJC race meetings for results and field information.')
+    parser.add_argument('--db', help='Also upsert results and field information into this racing database (see racing_db.py)')
+    parser.add_argument('--fresh', action='store_true', help='Discard the journal of an interrupted run and start the crawl over')
+    args = parser.parse_args()
+    main(args.db, args.fresh)
@@ -0,0 +1,122 @@
+import tempfile
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from sklearn.experimental import enable_halving_search_cv  # Makes HalvingGridSearchCV importable
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV, ParameterGrid
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OrdinalEncoder, TargetEncoder
+from race_prep import HORSE_ID, LOW_CARDINALITY_FEATURES
+from race_encoders import make_preprocessor
+
+# Hyperparameter grid searched for the forest of every distance
+FOREST_PARAM_GRID = {
+    'regressor__n_estimators': [100, 200],
+    'regressor__max_depth': [None, 10, 20],
+    'regressor__min_samples_split': [2, 5],
+    'regressor__min_samples_leaf': [1, 2]
+}
+
+# Ways of searching FOREST_PARAM_GRID: 'halving' (successive halving, the default) fits every candidate
+# with a few trees and only the best 1/HALVING_FACTOR of them with HALVING_FACTOR times more trees each
+# round, up to the grid's largest n_estimators; 'grid' fits every candidate at every n_estimators.
+# Trees rather than rows are the halved resource: a forest's fit time grows with its trees even on the
+# few hundred races of a distance, and more trees never make a forest worse, only slower.
+TUNING_MODES = ['halving', 'grid']
+HALVING_FACTOR = 3
+
+# Categorical features the boosting model splits on natively; horses are far too many for native
+# categories (at most MAX_NATIVE_CATEGORIES), so the horse id is target encoded instead
+NATIVE_CATEGORICAL_FEATURES = LOW_CARDINALITY_FEATURES + ['Trainer', 'Jockey']
+MAX_NATIVE_CATEGORIES = 255
+
+# Share of the most recent training races held out to stop boosting, and the iteration cap
+VALIDATION_FRACTION = 0.1
+MAX_ITER = 1000
+
+# Function to place the parallelism at the level that keeps every core busy: when the search always has
+# at least one fit per core it runs them in parallel on single-threaded forests; otherwise the fits run
+# one after another and each forest builds its trees on every core. Returns (search jobs, forest jobs).
+def split_jobs(parallel_fits):
+    cores = joblib.cpu_count()
+    if parallel_fits >= cores:
+        return cores, 1
+    return 1, -1
+
+# Function to fit the random forest pipeline, searching param_grid when one is given. The preprocessing
+# fitted for a fold is cached and reused by every candidate scored on that fold.
+def fit_forest_model(X, y, numerical_features, encoder, param_grid=None, cv=3, tuning='halving', random_state=42):
+    if tuning not in TUNING_MODES:
+        raise ValueError(f"Unknown tuning {tuning!r}, expected one of {', '.join(TUNING_MODES)}")
+    if not param_grid:
+        parallel_fits = 1
+    elif tuning == 'halving':
+        # Successive halving ends with a few candidates on the most trees, its most expensive round, so
+        # its fits are never enough to keep the cores busy and the parallelism goes to the trees
+        trees = param_grid.get('regressor__n_estimators', [100])
+        param_grid = {name: values for name, values in param_grid.items() if name != 'regressor__n_estimators'}
+        parallel_fits = 1
+    else:
+        parallel_fits = cv * len(ParameterGrid(param_grid))
+    search_jobs, forest_jobs = split_jobs(parallel_fits)
+
+    with tempfile.TemporaryDirectory(prefix='race-model-cache-') as cache_dir:
+        model = Pipeline(steps=[
+            ('preprocessor', make_preprocessor(numerical_features, encoder)),
+            ('regressor', RandomForestRegressor(random_state=random_state, n_jobs=forest_jobs))
+        ], memory=cache_dir if param_grid else None)
+        if not param_grid:
+            best_model = model.fit(X, y)
+        elif tuning == 'halving':
+            search = HalvingGridSearchCV(model, param_grid, factor=HALVING_FACTOR, resource='regressor__n_estimators',
+                                         max_resources=max(trees), cv=cv, scoring='neg_mean_squared_error',
+                                         n_jobs=search_jobs, random_state=random_state)
+            best_model = search.fit(X, y).best_estimator_
+        else:
+            search = GridSearchCV(model, param_grid, cv=cv, scoring='neg_mean_squared_error', n_jobs=search_jobs)
+            best_model = search.fit(X, y).best_estimator_
+
+    # Race cards are a dozen rows, too few for predicting on several threads to pay off
+    return best_model.set_params(memory=None, regressor__n_jobs=None)
+
+# Function to build the gradient boosting pipeline: course, going, class, trainer and jockey as native
+# categories (rare values grouped, unseen ones treated as missing), the horse id target encoded and the
+# numbers passed through, since boosting handles missing values and needs no scaling
+def make_boosting_model(numerical_features, max_iter=MAX_ITER, early_stopping=True, random_state=42):
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('cat', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1, encoded_missing_value=-1,
+                                   max_categories=MAX_NATIVE_CATEGORIES), NATIVE_CATEGORICAL_FEATURES),
+            ('ids', TargetEncoder(target_type='continuous'), [HORSE_ID]),
+            ('num', 'passthrough', numerical_features)
+        ])
+    regressor = HistGradientBoostingRegressor(
+        max_iter=max_iter,
+        categorical_features=list(range(len(NATIVE_CATEGORICAL_FEATURES))),
+        early_stopping=early_stopping,
+        random_state=random_state)
+    return Pipeline(steps=[('preprocessor', preprocessor), ('regressor', regressor)])
+
+# Function to fit the gradient boosting pipeline with early stopping on the most recent races: it is first
+# fitted on the older races while scoring the newest VALIDATION_FRACTION, then refitted on all rows for
+# the number of iterations that scored best. Without dates the row order is taken as time order.
+def fit_boosting_model(X, y, numerical_features, dates=None, random_state=42):
+    order = np.argsort(pd.Series(dates).to_numpy(), kind='stable') if dates is not None else np.arange(len(X))
+    validation_rows = max(1, int(len(X) * VALIDATION_FRACTION))
+    fit_rows, validation = order[:-validation_rows], order[-validation_rows:]
+
+    # fit_transform keeps the horse target encoding of the fitted rows out-of-fold, as in Pipeline.fit
+    search = make_boosting_model(numerical_features, random_state=random_state)
+    preprocessor = search.named_steps['preprocessor']
+    X_fit = preprocessor.fit_transform(X.iloc[fit_rows], y.iloc[fit_rows])
+    search.named_steps['regressor'].fit(X_fit, y.iloc[fit_rows], X_val=preprocessor.transform(X.iloc[validation]), y_val=y.iloc[validation])
+    # validation_score_ starts with the score before the first iteration; later iterations past the best are dropped
+    best_iter = max(1, int(np.argmax(search.named_steps['regressor'].validation_score_)))
+
+    model = make_boosting_model(numerical_features, max_iter=best_iter, early_stopping=False, random_state=random_state)
+    return model.fit(X, y)
+
+# Model engines selectable per distance
+ENGINES = ['forest', 'boosting']
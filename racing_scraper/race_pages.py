@@ -0,0 +1,44 @@
+from http_cache import cached_get, fetch_content
+import common_path  # Makes scraper_common importable
+from scraper_common.parsing import make_soup
+
+# Base URL for the starting page
+base_url = "https://racing.hkjc.com/racing/information/English/racing/LocalResults.aspx"
+
+# Function to get the race dates
+def get_race_dates():
+    response = cached_get(base_url)
+    soup = make_soup(response.content, [('select', 'id', 'selectId')])
+    select_tag = soup.find('select', {'id': 'selectId'})
+    options = select_tag.find_all('option')
+    race_dates = [option['value'] for option in options if option['value']]
+    return race_dates
+
+# Function to get the race URLs for a specific date
+def get_race_urls(date):
+    race_date_url = f"https://racing.hkjc.com/racing/information/English/Racing/LocalResults.aspx?RaceDate={date.replace('/', '%2F')}"
+    response = cached_get(race_date_url)
+    soup = make_soup(response.content, [('table', 'class', 'f_fs12 js_racecard')])
+    race_urls = [race_date_url]
+
+    table = soup.find('table', {'class': 'f_fs12 js_racecard'})
+    if table:
+        links = table.find_all('a', href=True)
+        for link in links:
+            race_url = f"https://racing.hkjc.com{link['href']}"
+            race_urls.append(race_url)
+
+    return race_urls
+
+# Function to fetch and parse the given containers of a race page, or return None if the fetch failed;
+# retries with backoff happen in the shared HTTP client
+def get_race_soup(url, containers):
+    content = fetch_content(url)
+    if content is None:
+        return None
+    return make_soup(content, containers)
+
+# Function to build a sortable key for a race from its date (dd/mm/yyyy) and race number, e.g. '20240608-01'
+def race_key(date, race_no):
+    day, month, year = date.split('/')
+    return f"{year}{month}{day}-{int(race_no):02d}"
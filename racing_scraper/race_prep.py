@@ -0,0 +1,47 @@
+import pandas as pd
+from gear_codes import add_gear_flags, GEAR_CODES
+from race_types import parse_race_time
+
+# One id per horse: 'Horse Number' is the horse's unique brand number and 'Horse Name' only repeats it,
+# so the model sees the number, or the name where no number was scraped
+HORSE_ID = 'Horse Id'
+
+# Model features of a race record; categorical features are split by how many distinct values they take
+NUMERICAL_FEATURES = ['Draw', 'Rating', 'Win Odds', 'Actual Weight', 'Declared Horse Weight']
+LOW_CARDINALITY_FEATURES = ['Racecourse', 'Track', 'Course', 'Distance', 'Going', 'Race Class']
+HIGH_CARDINALITY_FEATURES = [HORSE_ID, 'Trainer', 'Jockey']
+CATEGORICAL_FEATURES = HIGH_CARDINALITY_FEATURES + LOW_CARDINALITY_FEATURES
+
+# Categorical features compared as text; Distance stays numeric so models can be picked by it
+TEXT_FEATURES = [column for column in CATEGORICAL_FEATURES if column != 'Distance']
+
+# Explicit dtypes of the numeric inputs, applied in a single cast
+FEATURE_DTYPES = {**{column: 'float64' for column in NUMERICAL_FEATURES + ['Distance']}, **{code: 'uint8' for code in GEAR_CODES}}
+
+# Function to get the horse id of every row: the horse number, or the horse name where the number is missing
+def horse_id(frame):
+    ids = pd.Series(pd.NA, index=frame.index, dtype='string')
+    for column in ['Horse Number', 'Horse Name']:
+        if column in frame:
+            ids = ids.fillna(frame[column].astype('string').replace('', pd.NA))
+    return ids
+
+# Function to give model inputs the same types whether they come from the CSV, the Parquet store or a race card:
+# numbers as float, categories as text, gear as 0/1 flags. Only columns still holding text are parsed.
+def prepare_features(frame):
+    frame = add_gear_flags(frame)
+    frame[HORSE_ID] = horse_id(frame)
+    text_numbers = [column for column in NUMERICAL_FEATURES + ['Distance'] if not pd.api.types.is_numeric_dtype(frame[column])]
+    if text_numbers:
+        frame[text_numbers] = frame[text_numbers].apply(pd.to_numeric, errors='coerce')
+    frame = frame.astype(FEATURE_DTYPES)
+    frame[TEXT_FEATURES] = frame[TEXT_FEATURES].astype('string').fillna('').astype(str)
+    return frame
+
+# Function to prepare loaded race records for training in one vectorized pass: finish times in either
+# format ('1.11.47' or '1:22.16') become seconds, features are typed, and rows without a finish time are dropped
+def prepare_records(data):
+    data = data.copy()
+    data['Finish Time'] = parse_race_time(data['Finish Time'])
+    data = prepare_features(data)
+    return data.dropna(subset=['Finish Time'])
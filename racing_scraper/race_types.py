@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from gear_codes import gear_flags_from_columns, GEAR_CODES, GEAR_BITS, GEAR_MASK_COLUMN
+
+# Scraper tables: the CSV they are written to and their race date column and its format
+TABLES = {
+    'results': {'csv': 'race_results_full.csv', 'date': 'date', 'date_format': '%d/%m/%Y'},
+    'records': {'csv': 'race_records.csv', 'date': 'Date', 'date_format': '%d/%m/%y'},
+    'field': {'csv': 'field_information.csv', 'date': 'Race date', 'date_format': '%d/%m/%Y'},
+    'horses': {'csv': 'horses_all.csv', 'date': None, 'date_format': None},
+}
+
+# Column types per table; columns not listed are kept as strings
+SCHEMAS = {
+    'results': {
+        'racing number': 'Int8', 'horse no.': 'Int8', 'Dr.': 'Int8',
+        'Act. Wt.': 'Int16', 'Declar. horse Wt.': 'Int16', 'Win Odds': 'float32', 'Finish time': 'time',
+        'Running Position 1': 'Int8', 'Running Position 2': 'Int8', 'Running Position 3': 'Int8',
+        'Running Position 4': 'Int8', 'Running Position 5': 'Int8',
+        'horse id': 'category', 'horse name': 'category', 'jockey id': 'category', 'jockey name': 'category',
+        'trainer id': 'category', 'trainer name': 'category', 'pla.': 'category', 'LBW': 'category',
+    },
+    'records': {
+        'Race Index': 'Int16', 'Distance': 'Int16', 'Draw': 'Int8', 'Rating': 'Int16',
+        'Actual Weight': 'Int16', 'Declared Horse Weight': 'Int16', 'Win Odds': 'float32', 'Finish Time': 'time',
+        'Running Position1': 'Int8', 'Running Position2': 'Int8', 'Running Position3': 'Int8',
+        'Running Position4': 'Int8', 'Running Position5': 'Int8', GEAR_MASK_COLUMN: 'uint64',
+        'Horse Number': 'category', 'Horse Name': 'category', 'Placing': 'category', 'Racecourse': 'category',
+        'Track': 'category', 'Course': 'category', 'Going': 'category', 'Race Class': 'category',
+        'Trainer': 'category', 'Jockey': 'category', 'LBW': 'category',
+    },
+    'field': {
+        'Race number': 'Int8', 'Race index': 'Int16', 'Distance': 'Int16', 'RNumber1': 'Int16', 'RNumber2': 'Int16',
+        'Time1': 'time', 'Time2': 'time', 'Time3': 'time', 'Time4': 'time', 'Time5': 'time',
+        'Sectional Time1': 'time', 'Sectional Time2': 'time', 'Sectional Time3': 'time',
+        'Sectional Time4': 'time', 'Sectional Time5': 'time',
+        'Class': 'category', 'Going': 'category', 'Track': 'category', 'Course': 'category',
+    },
+    'horses': {
+        'Age': 'Int8', 'Season Stakes*': 'money', 'Total Stakes*': 'money',
+        'No. of starts in past 10 race meetings': 'Int8', 'Current Rating': 'Int16', 'Start of Season Rating': 'Int16',
+        'Arrival Date': 'date', 'Import Date': 'date',
+        'Country of Origin': 'category', 'Sex': 'category', 'Colour': 'category', 'Import Type': 'category',
+        'Current Stable Location': 'category', 'Trainer': 'category', 'Sire': 'category', "Dam's Sire": 'category',
+    },
+}
+
+# Function to convert race times to seconds, vectorized; accepts '1:22.16', '1.11.47' and '27.59'.
+# Anything else ('---', blanks) becomes NaN, and columns that are already numeric are returned as float.
+# Finish times repeat a lot, so only the distinct strings are parsed and the results are mapped back.
+def parse_race_time(times):
+    times = pd.Series(times)
+    if pd.api.types.is_numeric_dtype(times):
+        return times.astype('float64')
+    codes, distinct = pd.factorize(times)
+    parts = pd.Series(distinct, dtype='string').str.strip().str.extract(r'^(?:(\d+)[:.])?(\d{1,2})\.(\d+)$')
+    minutes = pd.to_numeric(parts[0], errors='coerce').fillna(0)
+    seconds = pd.to_numeric(parts[1], errors='coerce')
+    fraction = pd.to_numeric('0.' + parts[2], errors='coerce')
+    distinct_seconds = np.append((minutes * 60 + seconds + fraction).to_numpy(dtype='float64', na_value=np.nan), np.nan)
+    return pd.Series(distinct_seconds[codes], index=times.index)  # Code -1 (missing) picks the trailing NaN
+
+# Function to get the HKJC season of each date; a season starts in September, so 2023 means 2023/24
+def season_of(dates):
+    return (dates.dt.year - (dates.dt.month < 9)).astype('Int16')
+
+# Function to rebuild the gear mask from the per-code boolean columns of older race-record files
+def gear_mask_from_flags(data):
+    flags = gear_flags_from_columns(data).to_numpy(dtype=np.uint64)
+    bits = np.array([GEAR_BITS[code] for code in GEAR_CODES], dtype=np.uint64)
+    return pd.Series(np.bitwise_or.reduce(flags * bits, axis=1), index=data.index)
+
+# Function to give a scraped table its dtypes, a parsed race date and, for dated tables, its season
+def to_typed(name, data):
+    table = TABLES[name]
+    data = data.copy()
+    if name == 'records' and GEAR_MASK_COLUMN not in data and any(code in data for code in GEAR_CODES):
+        data[GEAR_MASK_COLUMN] = gear_mask_from_flags(data)
+        data = data.drop(columns=[code for code in GEAR_CODES if code in data])
+
+    for column, dtype in SCHEMAS[name].items():
+        if column not in data:
+            continue
+        values = data[column]
+        if dtype == 'time':
+            data[column] = parse_race_time(values).astype('float32')
+        elif dtype == 'money':
+            data[column] = pd.to_numeric(values.astype('string').str.replace(r'[$,]', '', regex=True), errors='coerce').astype('Int64')
+        elif dtype == 'date':
+            data[column] = pd.to_datetime(values, format='%d/%m/%Y', errors='coerce')
+        elif dtype == 'category':
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                data[column] = values.astype('string').astype('category')
+        elif dtype == 'uint64':
+            data[column] = values.astype('uint64')
+        else:
+            data[column] = pd.to_numeric(values, errors='coerce').astype(dtype)
+
+    if table['date'] and table['date'] in data:
+        data[table['date']] = pd.to_datetime(data[table['date']], format=table['date_format'], errors='coerce')
+        data['season'] = season_of(data[table['date']])
+    return data
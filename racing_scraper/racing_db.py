@@ -0,0 +1,197 @@
+import os
+import time
+import sqlite3
+import argparse
+import pandas as pd
+from race_types import TABLES, to_typed
+
+# Default database file
+DB_PATH = os.environ.get('RACING_DB_PATH', 'racing.sqlite')
+
+# Database tables per scraper table: the SQL table name, its primary key, and its columns as
+# (column, SQL type, scraper column); a scraper column of None means the value is derived at load time
+DB_TABLES = {
+    'results': {
+        'table': 'results',
+        'key': ['race_date', 'race_no', 'horse_id'],
+        'columns': [
+            ('race_date', 'TEXT NOT NULL', 'date'), ('race_no', 'INTEGER NOT NULL', 'racing number'),
+            ('season', 'INTEGER', 'season'), ('placing', 'TEXT', 'pla.'), ('position', 'INTEGER', None),
+            ('horse_no', 'INTEGER', 'horse no.'), ('horse_id', 'TEXT', 'horse id'), ('horse_code', 'TEXT', None),
+            ('horse_name', 'TEXT', 'horse name'), ('jockey_id', 'TEXT', 'jockey id'), ('jockey_name', 'TEXT', 'jockey name'),
+            ('trainer_id', 'TEXT', 'trainer id'), ('trainer_name', 'TEXT', 'trainer name'),
+            ('actual_weight', 'INTEGER', 'Act. Wt.'), ('declared_weight', 'INTEGER', 'Declar. horse Wt.'),
+            ('draw', 'INTEGER', 'Dr.'), ('lbw', 'TEXT', 'LBW'),
+            ('running_position_1', 'INTEGER', 'Running Position 1'), ('running_position_2', 'INTEGER', 'Running Position 2'),
+            ('running_position_3', 'INTEGER', 'Running Position 3'), ('running_position_4', 'INTEGER', 'Running Position 4'),
+            ('running_position_5', 'INTEGER', 'Running Position 5'),
+            ('finish_time', 'REAL', 'Finish time'), ('win_odds', 'REAL', 'Win Odds'),
+        ],
+    },
+    'field': {
+        'table': 'races',
+        'key': ['race_date', 'race_no'],
+        'columns': [
+            ('race_date', 'TEXT NOT NULL', 'Race date'), ('race_no', 'INTEGER NOT NULL', 'Race number'),
+            ('season', 'INTEGER', 'season'), ('race_index', 'INTEGER', 'Race index'), ('race_class', 'TEXT', 'Class'),
+            ('distance', 'INTEGER', 'Distance'), ('rating_high', 'INTEGER', 'RNumber1'), ('rating_low', 'INTEGER', 'RNumber2'),
+            ('race_name', 'TEXT', 'RC'), ('going', 'TEXT', 'Going'), ('track', 'TEXT', 'Track'), ('course', 'TEXT', 'Course'),
+            ('class_summary', 'TEXT', 'ClassSummary'),
+            ('time_1', 'REAL', 'Time1'), ('time_2', 'REAL', 'Time2'), ('time_3', 'REAL', 'Time3'),
+            ('time_4', 'REAL', 'Time4'), ('time_5', 'REAL', 'Time5'),
+            ('sectional_time_1', 'REAL', 'Sectional Time1'), ('sectional_time_2', 'REAL', 'Sectional Time2'),
+            ('sectional_time_3', 'REAL', 'Sectional Time3'), ('sectional_time_4', 'REAL', 'Sectional Time4'),
+            ('sectional_time_5', 'REAL', 'Sectional Time5'),
+        ],
+    },
+    'horses': {
+        'table': 'horses',
+        'key': ['horse_id'],
+        'columns': [
+            ('horse_id', 'TEXT NOT NULL', 'Horse Id'), ('horse_name', 'TEXT', 'Horse Name'),
+            ('country', 'TEXT', 'Country of Origin'), ('age', 'INTEGER', 'Age'), ('sex', 'TEXT', 'Sex'),
+            ('colour', 'TEXT', 'Colour'), ('import_type', 'TEXT', 'Import Type'),
+            ('season_stakes', 'INTEGER', 'Season Stakes*'), ('total_stakes', 'INTEGER', 'Total Stakes*'),
+            ('record_123_starts', 'TEXT', 'No. of 1-2-3-Starts*'), ('recent_starts', 'INTEGER', 'No. of starts in past 10 race meetings'),
+            ('stable_location', 'TEXT', 'Current Stable Location'), ('arrival_date', 'TEXT', 'Arrival Date'),
+            ('import_date', 'TEXT', 'Import Date'), ('trainer_id', 'TEXT', 'Trainer'), ('owner', 'TEXT', 'Owner'),
+            ('current_rating', 'INTEGER', 'Current Rating'), ('season_start_rating', 'INTEGER', 'Start of Season Rating'),
+            ('sire', 'TEXT', 'Sire'), ('dam', 'TEXT', 'Dam'), ('dams_sire', 'TEXT', "Dam's Sire"), ('same_sire', 'TEXT', 'Same Sire'),
+        ],
+    },
+}
+
+# Indexes for the usual lookups; (race_date, race_no) is served by the primary keys of results and races
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS results_horse_id ON results (horse_id)",
+    "CREATE INDEX IF NOT EXISTS results_horse_code ON results (horse_code)",
+    "CREATE INDEX IF NOT EXISTS results_jockey ON results (jockey_id, season)",
+    "CREATE INDEX IF NOT EXISTS results_trainer ON results (trainer_id, season)",
+    "CREATE INDEX IF NOT EXISTS horses_trainer ON horses (trainer_id)",
+]
+
+# Prebuilt views. Horse profiles are keyed by brand code ('H311'), results by the full id ('HK_2022_H311'),
+# so horses are joined on results.horse_code.
+VIEWS = [
+    """CREATE VIEW IF NOT EXISTS horse_career AS
+        SELECT r.horse_id, r.horse_code, MAX(r.horse_name) AS horse_name, COUNT(*) AS starts,
+               SUM(r.position = 1) AS wins, SUM(r.position BETWEEN 1 AND 3) AS places,
+               ROUND(AVG(r.position), 2) AS avg_position, ROUND(AVG(r.finish_time), 2) AS avg_finish_time,
+               MIN(r.race_date) AS first_race, MAX(r.race_date) AS last_race,
+               h.current_rating, h.trainer_id AS current_trainer, h.sire, h.dam, h.total_stakes
+        FROM results r LEFT JOIN horses h ON h.horse_id = r.horse_code
+        GROUP BY r.horse_id""",
+    """CREATE VIEW IF NOT EXISTS jockey_season AS
+        SELECT jockey_id, MAX(jockey_name) AS jockey_name, season, COUNT(*) AS rides,
+               SUM(position = 1) AS wins, SUM(position BETWEEN 1 AND 3) AS places,
+               ROUND(1.0 * SUM(position = 1) / COUNT(*), 3) AS win_rate, ROUND(AVG(win_odds), 2) AS avg_win_odds
+        FROM results
+        GROUP BY jockey_id, season""",
+    """CREATE VIEW IF NOT EXISTS trainer_season AS
+        SELECT trainer_id, MAX(trainer_name) AS trainer_name, season, COUNT(*) AS runners,
+               SUM(position = 1) AS wins, SUM(position BETWEEN 1 AND 3) AS places,
+               ROUND(1.0 * SUM(position = 1) / COUNT(*), 3) AS win_rate
+        FROM results
+        GROUP BY trainer_id, season""",
+    """CREATE VIEW IF NOT EXISTS runner_conditions AS
+        SELECT r.*, c.race_class, c.distance, c.going, c.track, c.course, c.rating_high, c.rating_low
+        FROM results r LEFT JOIN races c ON c.race_date = r.race_date AND c.race_no = r.race_no""",
+]
+
+# Function to build the CREATE TABLE statement of a table
+def create_table_sql(name):
+    table = DB_TABLES[name]
+    columns = ', '.join(f"{column} {sql_type}" for column, sql_type, _ in table['columns'])
+    return f"CREATE TABLE IF NOT EXISTS {table['table']} ({columns}, PRIMARY KEY ({', '.join(table['key'])}))"
+
+# Function to convert scraper rows (a DataFrame or a list of dicts) into database rows, typed the same way as the Parquet store
+def to_db_rows(name, data):
+    typed = to_typed(name, pd.DataFrame(data))
+    frame = pd.DataFrame(index=typed.index)
+    for column, sql_type, source in DB_TABLES[name]['columns']:
+        if source is None or source not in typed:
+            frame[column] = None
+            continue
+        values = typed[source]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.strftime('%Y-%m-%d')
+        elif pd.api.types.is_float_dtype(values):
+            values = values.astype('float64').round(2)
+        frame[column] = values
+
+    if name == 'results':
+        frame['position'] = pd.to_numeric(frame['placing'].astype('string').str.extract(r'^(\d+)')[0], errors='coerce').astype('Int8')
+        frame['horse_code'] = frame['horse_id'].astype('string').str.split('_').str[-1]
+    frame = frame.astype(object)
+    return list(frame.where(frame.notna(), None).itertuples(index=False, name=None))
+
+# Class for the embedded racing database: scraper outputs are upserted by primary key and queried with SQL
+class RacingDatabase:
+    def __init__(self, path=DB_PATH):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        for name in DB_TABLES:
+            self.connection.execute(create_table_sql(name))
+        for statement in INDEXES + VIEWS:
+            self.connection.execute(statement)
+        self.connection.commit()
+
+    # Function to insert or replace scraper rows of a table ('results', 'field' or 'horses'); returns the row count
+    def upsert(self, name, data):
+        table = DB_TABLES[name]
+        rows = to_db_rows(name, data)
+        columns = [column for column, _, _ in table['columns']]
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO {table['table']} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows)
+        self.connection.commit()
+        return len(rows)
+
+    # Function to run a query and return the result as a DataFrame
+    def query(self, sql, params=()):
+        return pd.read_sql_query(sql, self.connection, params=params)
+
+    # Function to refresh the statistics the query planner uses, after a large load
+    def analyze(self):
+        self.connection.execute("ANALYZE")
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+# Function for scrapers to upsert the rows they just wrote into a database file
+def upsert_into_database(db_file, name, data):
+    database = RacingDatabase(db_file)
+    rows = database.upsert(name, data)
+    database.close()
+    print(f"Upserted {rows} rows into {DB_TABLES[name]['table']} in {db_file}")
+
+# Main function to load scraper CSVs into the database, or run a query against it
+def main():
+    parser = argparse.ArgumentParser(description='Load scraper CSV outputs into the racing database, or query it.')
+    parser.add_argument('--db', default=DB_PATH, help='Database file')
+    parser.add_argument('--tables', nargs='+', choices=list(DB_TABLES), default=list(DB_TABLES), help='Tables to load (default: all)')
+    for name in DB_TABLES:
+        parser.add_argument(f'--{name}-csv', default=TABLES[name]['csv'], help=f'CSV to load the {name} table from')
+    parser.add_argument('--query', help='SQL to run instead of loading, e.g. "SELECT * FROM jockey_season WHERE jockey_id = \'PZ\'"')
+    args = parser.parse_args()
+
+    database = RacingDatabase(args.db)
+    if args.query:
+        start = time.perf_counter()
+        result = database.query(args.query)
+        print(result.to_string(index=False))
+        print(f"{len(result)} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+    else:
+        for name in args.tables:
+            csv_path = getattr(args, f'{name}_csv')
+            if not os.path.exists(csv_path):
+                print(f"Skipping {name}: {csv_path} not found")
+                continue
+            rows = database.upsert(name, pd.read_csv(csv_path, dtype=str, keep_default_na=False, na_values=['']))
+            print(f"Upserted {rows} rows from {csv_path} into {DB_TABLES[name]['table']}")
+        database.analyze()
+    database.close()
+
+if __name__ == "__main__":
+    main()
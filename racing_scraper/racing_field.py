@@ -1,34 +1,17 @@
-import requests
-from bs4 import BeautifulSoup
+import argparse
 import pandas as pd
+from race_pages import get_race_dates, get_race_urls, get_race_soup
+from http_cache import invalidate
+from crawl_journal import CrawlJournal
+from racing_db import upsert_into_database
 
-# Base URL for the starting page
-base_url = "https://racing.hkjc.com/racing/information/English/racing/LocalResults.aspx"
-
-# Function to get the race dates
-def get_race_dates():
-    response = requests.get(base_url)
-    soup = BeautifulSoup(response.content, 'html.parser')
-    select_tag = soup.find('select', {'id': 'selectId'})
-    options = select_tag.find_all('option')
-    race_dates = [option['value'] for option in options if option['value']]
-    return race_dates
-
-# Function to get the race URLs for a specific date
-def get_race_urls(date):
-    race_date_url = f"https://racing.hkjc.com/racing/information/English/Racing/LocalResults.aspx?RaceDate={date.replace('/', '%2F')}"
-    response = requests.get(race_date_url)
-    soup = BeautifulSoup(response.content, 'html.parser')
-    race_urls = [race_date_url]
-
-    table = soup.find('table', {'class': 'f_fs12 js_racecard'})
-    if table:
-        links = table.find_all('a', href=True)
-        for link in links:
-            race_url = f"https://racing.hkjc.com{link['href']}"
-            race_urls.append(race_url)
+# Columns of field_information.csv
+FIELD_COLUMNS = ["Race date", "Race number", "Race index", "Class", "Distance", "RNumber1", "RNumber2", "RC", "Going", "Track", "Course", "ClassSummary",
+                 "Time1", "Time2", "Time3", "Time4", "Time5", 
+                 "Sectional Time1", "Sectional Time2", "Sectional Time3", "Sectional Time4", "Sectional Time5"]
 
-    return race_urls
+# Page containers parse_field_info reads
+FIELD_CONTAINERS = [('div', 'class', 'race_tab')]
 
 # Function to extract field information from the race tab
 def extract_field_info(table):
@@ -125,15 +108,24 @@ def extract_field_info(table):
 
     return field_info
 
-# Function to scrape field information from a race URL
+# Function to scrape field information from a race URL; None if the fetch failed or the page is not a race page
 def scrape_field_info(url, date, race_no):
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, 'html.parser')
+    soup = get_race_soup(url, FIELD_CONTAINERS)
+    if soup is None:
+        return None
+    field_info = parse_field_info(soup, url, date, race_no)
+    if field_info is None:
+        invalidate(url)  # An error page served with status 200 is fetched again next time
+    return field_info
+
+# Function to extract field information rows from an already parsed race page; None if the page has no
+# race tab (an error page rather than a race page)
+def parse_field_info(soup, url, date, race_no):
     race_tab = soup.find('div', {'class': 'race_tab'})
 
     if not race_tab:
         print(f"No field information table found for {url}")
-        return []
+        return None
 
     table = race_tab.find('table')
     if table:
@@ -141,37 +133,49 @@ def scrape_field_info(url, date, race_no):
         return [[date, race_no, field_info['race_index'], field_info['class'], field_info['distance'], field_info['rnumber1'], field_info['rnumber2'], field_info['rc'], field_info['going'], field_info['track'], field_info['course'], field_info['class_summary']] + field_info['times'] + field_info['sectional_times']]
     else:
         print(f"No table found in race tab for {url}")
-        return []
+        return None
 
 # Main function to get and save all field information data to CSV
-def main():
-    all_field_data = []
+def main(db_file=None, fresh=False):
     race_dates = get_race_dates()
     url_count = 0
 
+    # Completed race pages and their rows are journalled so an interrupted crawl resumes
+    journal = CrawlJournal('racing_field', fresh=fresh)
+
     for date in race_dates:
         race_urls = get_race_urls(date)
         for i, url in enumerate(race_urls):
             if url_count >= 10000:  # Limit to the first 10 URLs
                 break
             race_no = i + 1  # Race number starts from 1
+            url_count += 1
+            if journal.is_done(url):
+                continue
             print(f"Scraping {url}...")
             field_data = scrape_field_info(url, date, race_no)
-            all_field_data.extend(field_data)
-            url_count += 1
+            if field_data is None:  # Failed fetches and error pages stay out of the journal
+                journal.record_failure(url)
+            else:
+                journal.record(url, field_data)
         if url_count >= 10000:
             break
 
     # Save the data to a CSV file
+    all_field_data = list(journal.rows())
     if all_field_data:
-        columns = ["Race date", "Race number", "Race index", "Class", "Distance", "RNumber1", "RNumber2", "RC", "Going", "Track", "Course", "ClassSummary",
-                   "Time1", "Time2", "Time3", "Time4", "Time5", 
-                   "Sectional Time1", "Sectional Time2", "Sectional Time3", "Sectional Time4", "Sectional Time5"]
-        df = pd.DataFrame(all_field_data, columns=columns)
+        df = pd.DataFrame(all_field_data, columns=FIELD_COLUMNS)
         df.to_csv('field_information.csv', index=False)
         print("Data saved to field_information.csv")
+        if db_file:
+            upsert_into_database(db_file, 'field', df)
     else:
         print("No field data found.")
+    journal.finish('field_information.csv')
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Scrape HKJC race field information.')
+    parser.add_argument('--db', help='Also upsert the field information into this racing database (see racing_db.py)')
+    parser.add_argument('--fresh', action='store_true', help='Discard the journal of an interrupted run and start the crawl over')
+    args = parser.parse_args()
+    main(args.db, args.fresh)
@@ -1,36 +1,22 @@
-import requests
-from bs4 import BeautifulSoup
+import os
+import argparse
 import pandas as pd
-import time
-from requests.exceptions import ConnectionError
-
-# Base URL for the starting page
-base_url = "https://racing.hkjc.com/racing/information/English/racing/LocalResults.aspx"
-
-# Function to get the race dates
-def get_race_dates():
-    response = requests.get(base_url)
-    soup = BeautifulSoup(response.content, 'html.parser')
-    select_tag = soup.find('select', {'id': 'selectId'})
-    options = select_tag.find_all('option')
-    race_dates = [option['value'] for option in options if option['value']]
-    return race_dates
-
-# Function to get the race URLs for a specific date
-def get_race_urls(date):
-    race_date_url = f"https://racing.hkjc.com/racing/information/English/Racing/LocalResults.aspx?RaceDate={date.replace('/', '%2F')}"
-    response = requests.get(race_date_url)
-    soup = BeautifulSoup(response.content, 'html.parser')
-    race_urls = [race_date_url]
-
-    table = soup.find('table', {'class': 'f_fs12 js_racecard'})
-    if table:
-        links = table.find_all('a', href=True)
-        for link in links:
-            race_url = f"https://racing.hkjc.com{link['href']}"
-            race_urls.append(race_url)
-
-    return race_urls
+from datetime import datetime
+from race_pages import get_race_dates, get_race_urls, get_race_soup
+from crawl_journal import CrawlJournal
+from http_cache import invalidate
+from racing_db import upsert_into_database
+
+# Columns of race_results.csv
+RESULT_COLUMNS = ["date", "racing number", "pla.", "horse no.", "horse id", "horse name", "jockey id", "jockey name", "trainer id", "trainer name", "Act. Wt.", "Declar. horse Wt.", "Dr.", "LBW", 
+                  "Running Position 1", "Running Position 2", "Running Position 3", "Running Position 4", "Running Position 5", 
+                  "Finish time", "Win Odds"]
+
+# Page containers parse_race_data reads
+RESULT_CONTAINERS = [('table', 'class', 'f_tac table_bd draggable')]
+
+# Columns identifying one runner in one race, used to upsert incremental results
+RESULT_KEY = ["date", "racing number", "horse id"]
 
 # Function to extract ID from href
 def extract_id(href, key):
@@ -40,24 +26,21 @@ def extract_id(href, key):
 
 # Function to scrape the race data from a race URL
 def scrape_race_data(url, date, race_no):
-    attempts = 3
-    for attempt in range(attempts):
-        try:
-            response = requests.get(url)
-            response.raise_for_status()  # Will raise an HTTPError for bad responses
-            soup = BeautifulSoup(response.content, 'html.parser')
-            table = soup.find('table', {'class': 'f_tac table_bd draggable'})
-            break  # If the request was successful, exit the loop
-        except (ConnectionError, requests.exceptions.RequestException) as e:
-            print(f"Attempt {attempt + 1} failed: {e}")
-            time.sleep(2 ** attempt)  # Exponential backoff
-    else:
-        print(f"Failed to retrieve data from {url} after {attempts} attempts.")
+    soup = get_race_soup(url, RESULT_CONTAINERS)
+    if soup is None:
         return []
-
+    race_data = parse_race_data(soup, url, date, race_no)
+    if race_data is None:
+        invalidate(url)  # An error page served with status 200 is fetched again next time
+    return race_data or []
+
+# Function to extract the results table rows from an already parsed race page; None if the page has no
+# results table (an error page rather than a race page)
+def parse_race_data(soup, url, date, race_no):
+    table = soup.find('table', {'class': 'f_tac table_bd draggable'})
     if not table:
         print(f"No results table found for {url}")
-        return []
+        return None
 
     race_data = []
     rows = table.find('tbody').find_all('tr')
@@ -95,11 +78,46 @@ def scrape_race_data(url, date, race_no):
 
     return race_data
 
+# Function to parse a dd/mm/yyyy race date
+def parse_race_date(date):
+    return datetime.strptime(date, '%d/%m/%Y')
+
+# Function to get the latest race date already stored in a results CSV
+def get_latest_stored_date(filename):
+    if not os.path.exists(filename):
+        return None
+    dates = pd.read_csv(filename, usecols=['date'], dtype=str)['date'].dropna()
+    parsed = pd.to_datetime(dates, format='%d/%m/%Y', errors='coerce').dropna()
+    return parsed.max().to_pydatetime() if not parsed.empty else None
+
+# Function to merge new results into a results CSV, new rows replacing stored rows with the same key
+def upsert_race_results(new_df, filename):
+    new_df = new_df.astype(str).replace('nan', '')
+    if os.path.exists(filename):
+        existing = pd.read_csv(filename, dtype=str, keep_default_na=False)
+        # Newest meetings go first, matching the order of the date dropdown
+        combined = pd.concat([new_df, existing], ignore_index=True)
+    else:
+        combined = new_df
+    combined = combined.drop_duplicates(subset=RESULT_KEY, keep='first')
+    combined.to_csv(filename, index=False)
+    print(f"Upserted {len(new_df)} rows into {filename} ({len(combined)} rows total)")
+
 # Main function to get and save all race data to CSV
-def main():
-    all_race_data = []
+def main(incremental=False, results_file='race_results_full.csv', db_file=None, fresh=False):
     race_dates = get_race_dates()
     url_count = 0
+    failed_dates = []
+
+    # Completed race pages and their rows are journalled so an interrupted crawl resumes; incremental and
+    # full runs cover different meetings and write different files, so each keeps its own journal
+    journal = CrawlJournal('racing_result_incremental' if incremental else 'racing_result', fresh=fresh)
+
+    if incremental:
+        latest_date = get_latest_stored_date(results_file)
+        if latest_date:
+            race_dates = [date for date in race_dates if parse_race_date(date) > latest_date]
+            print(f"Latest stored race date is {latest_date:%d/%m/%Y}, {len(race_dates)} new meetings to fetch")
 
     for date in race_dates:
         race_urls = get_race_urls(date)
@@ -107,23 +125,47 @@ def main():
             if url_count >= 20000:  # Limit to the first 20000 URLs
                 break
             race_no = i + 1  # Race number starts from 1
-            print(f"Scraping {url}...")
-            race_data = scrape_race_data(url, date, race_no)
-            all_race_data.extend(race_data)
             url_count += 1
+            if journal.is_done(url):
+                continue
+            print(f"Scraping {url}...")
+            soup = get_race_soup(url, RESULT_CONTAINERS)
+            race_data = parse_race_data(soup, url, date, race_no) if soup is not None else None
+            if soup is not None and race_data is None:
+                invalidate(url)  # An error page served with status 200 is fetched again next time
+            if race_data is None:  # Failed fetches and error pages stay out of the journal
+                journal.record_failure(url)
+                failed_dates.append(parse_race_date(date))
+            else:
+                journal.record(url, race_data)
         if url_count >= 20000:
             break
 
     # Save the data to a CSV file
+    all_race_data = list(journal.rows())
     if all_race_data:
-        columns = ["date", "racing number", "pla.", "horse no.", "horse id", "horse name", "jockey id", "jockey name", "trainer id", "trainer name", "Act. Wt.", "Declar. horse Wt.", "Dr.", "LBW", 
-                   "Running Position 1", "Running Position 2", "Running Position 3", "Running Position 4", "Running Position 5", 
-                   "Finish time", "Win Odds"]
-        df = pd.DataFrame(all_race_data, columns=columns)
-        df.to_csv('race_results.csv', index=False)
-        print("Data saved to race_results.csv")
+        df = pd.DataFrame(all_race_data, columns=RESULT_COLUMNS)
+        if incremental:
+            if failed_dates:
+                # Hold back meetings from the oldest incomplete one on, so the next incremental run fetches them again
+                cutoff = min(failed_dates)
+                df = df[pd.to_datetime(df['date'], format='%d/%m/%Y', errors='coerce') < cutoff]
+                print(f"Holding back meetings from {cutoff:%d/%m/%Y} on until all their races are fetched")
+            upsert_race_results(df, results_file)
+        else:
+            df.to_csv('race_results.csv', index=False)
+            print("Data saved to race_results.csv")
+        if db_file:
+            upsert_into_database(db_file, 'results', df)
     else:
         print("No race data found.")
+    journal.finish(results_file if incremental else 'race_results.csv')
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Scrape HKJC local race results.')
+    parser.add_argument('--incremental', action='store_true', help='Only fetch meetings after the latest date in the results file and upsert them')
+    parser.add_argument('--results-file', default='race_results_full.csv', help='Results CSV used by --incremental')
+    parser.add_argument('--db', help='Also upsert the results into this racing database (see racing_db.py)')
+    parser.add_argument('--fresh', action='store_true', help='Discard the journal of an interrupted run and start the crawl over')
+    args = parser.parse_args()
+    main(args.incremental, args.results_file, args.db, args.fresh)
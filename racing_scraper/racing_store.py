@@ -0,0 +1,63 @@
+import os
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from race_types import TABLES, to_typed
+
+# Root folder of the Parquet store; every table is a folder below it
+STORE_DIR = os.environ.get('RACING_STORE_DIR', 'racing_store')
+
+# Tables split into one folder per season (season=2023 holds 2023/24); the others are a single file
+PARTITIONED = {'results', 'records', 'field'}
+
+# Season folders are named season=<year>; read the year back as the int16 it was written as
+SEASON_PARTITIONING = ds.partitioning(pa.schema([('season', pa.int16())]), flavor='hive')
+
+# Function to get the folder of a table in the store
+def table_path(name, root=None):
+    return os.path.join(root or STORE_DIR, name)
+
+# Function to check whether a table has been written to the store
+def has_table(name, root=None):
+    return os.path.isdir(table_path(name, root))
+
+# Function to write a scraped table to the store, replacing the seasons it contains
+def write_table(name, data, root=None):
+    data = to_typed(name, data)
+    path = table_path(name, root)
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    if name in PARTITIONED:
+        pq.write_to_dataset(table, path, partition_cols=['season'], existing_data_behavior='delete_matching')
+    else:
+        os.makedirs(path, exist_ok=True)
+        pq.write_table(table, os.path.join(path, 'part-0.parquet'))
+    return len(data)
+
+# Function to read a table from the store, loading only the requested columns and the row groups
+# and season folders that can match the filters, e.g. [('Distance', '=', 1200), ('season', '>=', 2022)]
+def read_table(name, columns=None, filters=None, root=None):
+    partitioning = SEASON_PARTITIONING if name in PARTITIONED else None
+    table = pq.read_table(table_path(name, root), columns=columns, filters=filters, partitioning=partitioning)
+    return table.to_pandas()
+
+# Main function to load scraper CSVs into the store
+def main():
+    parser = argparse.ArgumentParser(description='Write scraper CSV outputs to the typed Parquet store.')
+    parser.add_argument('--tables', nargs='+', choices=list(TABLES), default=list(TABLES), help='Tables to write (default: all)')
+    parser.add_argument('--root', default=STORE_DIR, help='Store folder')
+    for name, table in TABLES.items():
+        parser.add_argument(f'--{name}-csv', default=table['csv'], help=f'CSV to read the {name} table from')
+    args = parser.parse_args()
+
+    for name in args.tables:
+        csv_path = getattr(args, f'{name}_csv')
+        if not os.path.exists(csv_path):
+            print(f"Skipping {name}: {csv_path} not found")
+            continue
+        rows = write_table(name, pd.read_csv(csv_path, dtype=str, keep_default_na=False, na_values=['']), args.root)
+        print(f"Wrote {rows} rows from {csv_path} to {table_path(name, args.root)}")
+
+if __name__ == "__main__":
+    main()
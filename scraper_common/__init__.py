@@ -0,0 +1,2 @@
+# Modules shared by the scrapers: HTTP client, rate limiting, HTML parsing and the parse process pool.
+# Scripts in a scraper folder import common_path first to put this package on sys.path.
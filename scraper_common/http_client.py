@@ -0,0 +1,125 @@
+import os
+import time
+import random
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from .rate_limit import get_limiter, parse_retry_after
+
+# Timeouts in seconds, overridable from the environment
+CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 30))
+
+# Retry settings: waits are drawn uniformly from [0, BACKOFF_BASE * 2 ** attempt] (full jitter)
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Circuit breaker settings: after FAILURE_THRESHOLD failures in a row a host is skipped
+# for RESET_TIMEOUT seconds, then a single trial request decides whether it recovers
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 60.0
+
+# Connections kept open per host; should cover the largest number of concurrent fetch threads
+POOL_SIZE = 32
+
+# Exception raised instead of sending a request to a host whose circuit is open
+class CircuitOpenError(requests.RequestException):
+    pass
+
+# Class to track consecutive failures of one host and stop sending it requests while it is down
+class CircuitBreaker:
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_in_flight or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.trial_in_flight = True  # Half-open: let one request through
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    # Function to give up a trial request that ended without an outcome (e.g. interrupted), so the next one may run
+    def release_trial(self):
+        with self.lock:
+            self.trial_in_flight = False
+
+_session = None
+_session_lock = threading.Lock()
+_breakers = {}
+
+# Function to get the shared keep-alive session, so TCP and TLS connections are reused across requests
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+# Function to get the circuit breaker for the host of a URL
+def get_breaker(url):
+    host = urlparse(url).netloc
+    with _session_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker()
+        return _breakers[host]
+
+# Function to GET a URL through the shared session with rate limiting, retries and the host's circuit breaker.
+# Returns the last response (callers still check its status) or raises a requests.RequestException.
+def http_get(url, timeout=None, max_retries=MAX_RETRIES, **kwargs):
+    breaker = get_breaker(url)
+    limiter = get_limiter(url)
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+    for attempt in range(max_retries + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {urlparse(url).netloc}, skipping {url}")
+        limiter.acquire()
+        start = time.monotonic()
+        try:
+            response = get_session().get(url, timeout=timeout, **kwargs)
+        except requests.RequestException as e:
+            # Any failed request counts, not only connection errors and timeouts: a body cut short
+            # (ChunkedEncodingError) or one that cannot be decoded must also end a half-open trial
+            limiter.record(599, time.monotonic() - start)
+            breaker.record_failure()
+            if attempt == max_retries:
+                raise
+            print(f"Attempt {attempt + 1} for {url} failed: {e}")
+        except BaseException:
+            breaker.release_trial()
+            raise
+        else:
+            limiter.record(response.status_code, time.monotonic() - start, parse_retry_after(response.headers.get('Retry-After')))
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+                return response
+            print(f"Attempt {attempt + 1} for {url} returned status {response.status_code}")
+        time.sleep(random.uniform(0, BACKOFF_BASE * 2 ** attempt))
@@ -0,0 +1,26 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Default number of extractor processes: one per core
+PARSE_WORKERS = os.cpu_count() or 1
+
+# Function to run extract(*args) for every args tuple in a pool of processes, yielding results in input order.
+# At most max_pending pages are held between the fetch stage and the writer, so a slow parse stage
+# stops the fetch generator from being pulled rather than letting raw HTML pile up in memory.
+# extract must be a module-level function so it can be sent to the worker processes.
+def parse_in_pool(jobs, extract, workers=PARSE_WORKERS, max_pending=None):
+    if workers <= 0:
+        for args in jobs:
+            yield extract(*args)
+        return
+
+    max_pending = max_pending or workers * 4
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for args in jobs:
+            pending.append(executor.submit(extract, *args))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
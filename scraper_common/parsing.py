@@ -0,0 +1,98 @@
+import os
+from bs4 import BeautifulSoup, UnicodeDammit
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# Parser backends, fastest first. 'html.parser' always builds the full BeautifulSoup tree;
+# 'lxml' and 'selectolax' scan the page with a C parser and, when an extractor names the
+# containers it needs, only hand those subtrees to BeautifulSoup.
+BACKENDS = ['selectolax', 'lxml', 'html.parser']
+PARSER_BACKEND = os.environ.get('HTML_PARSER_BACKEND', 'auto')
+
+# Function to list the backends whose libraries are installed
+def available_backends():
+    installed = {'selectolax': LexborHTMLParser is not None, 'lxml': lxml is not None, 'html.parser': True}
+    return [backend for backend in BACKENDS if installed[backend]]
+
+# Function to resolve 'auto' (or an unset backend) to the fastest installed one
+def resolve_backend(backend=None):
+    backend = backend or PARSER_BACKEND
+    if backend == 'auto':
+        return available_backends()[0]
+    if backend not in available_backends():
+        raise ValueError(f"HTML parser backend '{backend}' is not available, choose from {available_backends()}")
+    return backend
+
+# Function to get the BeautifulSoup tree builder used for full pages and extracted subtrees
+def soup_builder():
+    return 'lxml' if lxml is not None else 'html.parser'
+
+# Function to turn a container spec (tag, attribute, value) into a CSS selector
+def container_css(container):
+    tag, attribute, value = container
+    if attribute is None:
+        return tag
+    if attribute == 'class' and ' ' not in value:
+        return f'{tag}[class~="{value}"]'
+    return f'{tag}[{attribute}="{value}"]'
+
+# Function to turn a container spec (tag, attribute, value) into an XPath expression
+def container_xpath(container):
+    tag, attribute, value = container
+    if attribute is None:
+        return f'//{tag}'
+    if attribute == 'class' and ' ' not in value:
+        return f"//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {value} ')]"
+    return f'//{tag}[@{attribute}="{value}"]'
+
+# Function to serialize the outermost matching containers, in document order, with selectolax
+def select_with_selectolax(html, containers):
+    tree = LexborHTMLParser(html)
+    fragments = []
+    kept = set()
+    for node in tree.css(', '.join(container_css(container) for container in containers)):
+        ancestor = node.parent
+        while ancestor is not None and ancestor.mem_id not in kept:
+            ancestor = ancestor.parent
+        if ancestor is None:  # Nested matches are already inside a kept fragment
+            kept.add(node.mem_id)
+            fragments.append(node.html)
+    return fragments
+
+# Function to serialize the outermost matching containers, in document order, with lxml
+def select_with_lxml(html, containers):
+    tree = lxml.html.fromstring(html)
+    fragments = []
+    kept = set()
+    for node in tree.xpath(' | '.join(container_xpath(container) for container in containers)):
+        if not any(ancestor in kept for ancestor in node.iterancestors()):
+            kept.add(node)
+            fragments.append(lxml.html.tostring(node, encoding='unicode', with_tail=False))
+    return fragments
+
+# Function to build the BeautifulSoup tree an extractor searches.
+# containers is an optional list of (tag, attribute, value) specs such as ('div', 'class', 'race_tab'),
+# or (tag, None, None) for every tag of that name. When given, fast backends only parse those
+# subtrees, so extractors must not look outside them.
+def make_soup(html, containers=None, backend=None):
+    backend = resolve_backend(backend)
+    if backend == 'html.parser':
+        return BeautifulSoup(html, 'html.parser')
+    if not containers:
+        return BeautifulSoup(html, soup_builder())
+
+    if isinstance(html, bytes):
+        html = UnicodeDammit(html, is_html=True).unicode_markup
+    if backend == 'selectolax':
+        fragments = select_with_selectolax(html, containers)
+    else:
+        fragments = select_with_lxml(html, containers)
+    return BeautifulSoup('<html><body>' + ''.join(fragments) + '</body></html>', soup_builder())
@@ -0,0 +1,95 @@
+import time
+import asyncio
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# Default limiter settings (requests per second); a host starts at START_RATE and adapts from there
+START_RATE = 1.0
+MIN_RATE = 0.1
+MAX_RATE = 8.0
+
+# Status codes that mean the server wants us to slow down
+THROTTLE_STATUSES = {429, 503}
+
+# Class for a token bucket whose refill rate rises additively while a host is healthy
+# and drops multiplicatively when it throttles us, slows down or errors
+class AdaptiveRateLimiter:
+    def __init__(self, rate=START_RATE, min_rate=MIN_RATE, max_rate=MAX_RATE, burst=1,
+                 increase=0.1, decrease=0.5, slow_latency=2.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_latency = slow_latency
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    # Function to take one token and return how long the caller must wait before using it
+    def reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    # Function for thread-based fetchers: block until a request may be sent
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    # Function for asyncio fetchers: wait without blocking the event loop
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    # Function to adapt the rate from the outcome of a request
+    def record(self, status_code, latency, retry_after=None):
+        with self.lock:
+            if status_code in THROTTLE_STATUSES or status_code >= 500:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+            elif latency > self.slow_latency:
+                self.rate = max(self.min_rate, self.rate * 0.9)
+            elif status_code < 400:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+# Function to get the shared limiter for the host of a URL
+def get_limiter(url):
+    host = urlparse(url).netloc
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = AdaptiveRateLimiter()
+        return _limiters[host]
+
+# Function to report the current request rate of every host, e.g. {'racing.hkjc.com': 2.3}
+def rate_metrics():
+    with _limiters_lock:
+        return {host: round(limiter.rate, 2) for host, limiter in _limiters.items()}
+
+# Function to read a Retry-After header (seconds or an HTTP date) as a number of seconds
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+